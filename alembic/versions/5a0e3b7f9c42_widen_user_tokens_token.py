@@ -0,0 +1,28 @@
+"""widen user_tokens.token to 512 characters
+
+Revision ID: 5a0e3b7f9c42
+Revises: c72d9e04a1f8
+Create Date: 2026-10-18 14:36:12.087461
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a0e3b7f9c42'
+down_revision: Union[str, Sequence[str], None] = 'c72d9e04a1f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.alter_column('user_tokens', 'token', existing_type=sa.String(length=256), type_=sa.String(length=512), existing_nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column('user_tokens', 'token', existing_type=sa.String(length=512), type_=sa.String(length=256), existing_nullable=False)
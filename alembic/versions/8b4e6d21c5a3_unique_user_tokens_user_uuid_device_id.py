@@ -0,0 +1,43 @@
+"""unique index on user_tokens (user_uuid, device_id)
+
+Revision ID: 8b4e6d21c5a3
+Revises: 3f1c2a9b7d10
+Create Date: 2026-10-18 11:40:03.517992
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b4e6d21c5a3'
+down_revision: Union[str, Sequence[str], None] = '3f1c2a9b7d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keep only the newest token per device so the unique index can be built.
+    op.execute(
+        """
+        DELETE FROM user_tokens t
+        USING user_tokens newer
+        WHERE t.user_uuid = newer.user_uuid
+          AND t.device_id = newer.device_id
+          AND (t.expires_at, t.id) < (newer.expires_at, newer.id)
+        """
+    )
+    op.create_index(
+        'uq_user_tokens_user_uuid_device_id',
+        'user_tokens',
+        ['user_uuid', 'device_id'],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_user_tokens_user_uuid_device_id', table_name='user_tokens')
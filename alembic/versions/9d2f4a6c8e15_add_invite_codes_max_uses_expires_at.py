@@ -0,0 +1,31 @@
+"""add invite_codes.max_uses and invite_codes.expires_at
+
+Revision ID: 9d2f4a6c8e15
+Revises: e41b7c9a2d63
+Create Date: 2026-10-18 17:21:45.104622
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d2f4a6c8e15'
+down_revision: Union[str, Sequence[str], None] = 'e41b7c9a2d63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing codes keep working without limits.
+    op.add_column('invite_codes', sa.Column('max_uses', sa.Integer(), nullable=True))
+    op.add_column('invite_codes', sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('invite_codes', 'expires_at')
+    op.drop_column('invite_codes', 'max_uses')
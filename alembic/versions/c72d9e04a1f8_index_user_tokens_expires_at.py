@@ -0,0 +1,28 @@
+"""index user_tokens.expires_at
+
+Revision ID: c72d9e04a1f8
+Revises: 8b4e6d21c5a3
+Create Date: 2026-10-18 13:05:27.664120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c72d9e04a1f8'
+down_revision: Union[str, Sequence[str], None] = '8b4e6d21c5a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_user_tokens_expires_at'), 'user_tokens', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_user_tokens_expires_at'), table_name='user_tokens')
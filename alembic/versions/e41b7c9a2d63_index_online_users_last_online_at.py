@@ -0,0 +1,31 @@
+"""partial index on users.last_online_at for online users
+
+Revision ID: e41b7c9a2d63
+Revises: 5a0e3b7f9c42
+Create Date: 2026-10-18 15:02:11.530842
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41b7c9a2d63'
+down_revision: Union[str, Sequence[str], None] = '5a0e3b7f9c42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_users_online_last_online_at', 'users', ['last_online_at'], unique=False,
+        postgresql_where=sa.text('is_online IS true'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_online_last_online_at', table_name='users', postgresql_where=sa.text('is_online IS true'))
@@ -1,27 +1,63 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from slowapi.errors import RateLimitExceeded
 from slowapi import _rate_limit_exceeded_handler
 from contextlib import asynccontextmanager
 from utils.config import config
-from utils.db import test_db
+from utils.db import engine, test_db
+from utils.db.sweeper import token_sweeper
+from utils.db.presence import presence
+from utils.db.usernames import usernames
+from utils.db.replicas import replicas
+from utils.pubsub import broker
 from utils.log import logger
+from utils.hashing import hasher
+from utils.avatars import avatars
+from utils.cache import profile_cache
+from utils.metrics import registry
 from middleware.limiter import limiter
+from middleware.metrics import MetricsMiddleware
+from middleware.access_log import AccessLogMiddleware
+from middleware.profiler import ProfilerMiddleware
 
 from routers.auth import auth
 from routers.user import user
 from routers.utils import utils
 from routers.token import token
+from routers.events import events
+from routers.wellknown import wellknown
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     try:
         if await test_db():
             logger.info("Database connection successful.")
-            yield
+        else:
+            raise RuntimeError("SELECT 1 returned an unexpected result")
     except Exception as e:
         logger.error(f"Database connection failed: {e}")
         raise RuntimeError("Database connection failed") from e
-    
+
+    await broker.start()
+    profile_cache.start()
+    replicas.start()
+    token_sweeper.start()
+    presence.start()
+    usernames.start()
+    try:
+        yield
+    finally:
+        await usernames.stop()
+        await presence.stop()
+        await token_sweeper.stop()
+        await replicas.stop()
+        await profile_cache.stop()
+        await broker.stop()
+        hasher.shutdown()
+        avatars.shutdown()
+        await replicas.dispose()
+        await engine.dispose()
+
 app = FastAPI(
     title="AstroEyes API",
     version=config.version,
@@ -34,12 +70,21 @@ app = FastAPI(
 
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+if config.profile_sample_rate > 0 or config.profile_token:
+    app.add_middleware(ProfilerMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(AccessLogMiddleware)
 
 app.get("/")(lambda: {"message": "Welcome to AstroEyes API"})
+app.get("/metrics", include_in_schema=False)(
+    lambda: PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+)
 
 app.include_router(auth)
 app.include_router(token)
 app.include_router(user)
 app.include_router(utils)
+app.include_router(events)
+app.include_router(wellknown)
 
 
@@ -0,0 +1,65 @@
+"""
+`get_user_uuid` throughput with a cold and a warm verified-token cache.
+
+Usage:
+    python -m bench.jwt_cache [--iterations 100000] [--tokens 1000]
+
+"cold" runs with the cache size set to 0 so every call pays for the full HMAC
+verification and JSON decode, "warm" cycles over a set of already cached tokens.
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+os.environ.setdefault("SECRET_KEY", "bench-" + "0" * 58)
+
+from fastapi.security import HTTPAuthorizationCredentials
+
+from utils.jwt import create_access_token, get_user_uuid, verified_tokens
+
+def make_credentials(count: int) -> list[HTTPAuthorizationCredentials]:
+    credentials = []
+    for i in range(count):
+        token, _ = create_access_token(str(uuid.uuid4()), str(uuid.uuid4()), f"bench-device-{i}")
+        credentials.append(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token))
+    return credentials
+
+async def run(mode: str, credentials: list[HTTPAuthorizationCredentials], iterations: int) -> float:
+    maxsize = verified_tokens.maxsize
+    verified_tokens.clear()
+    if mode == "cold":
+        verified_tokens.maxsize = 0
+    else:
+        verified_tokens.maxsize = max(maxsize, len(credentials))
+        for c in credentials:
+            await get_user_uuid(c)
+
+    count = len(credentials)
+    try:
+        start = time.perf_counter()
+        for i in range(iterations):
+            await get_user_uuid(credentials[i % count])
+        return time.perf_counter() - start
+    finally:
+        verified_tokens.maxsize = maxsize
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100000, help="Calls per mode.")
+    parser.add_argument("--tokens", type=int, default=1000, help="Distinct tokens to cycle through.")
+    args = parser.parse_args()
+
+    credentials = make_credentials(args.tokens)
+    print(f"{'mode':<6}{'calls/s':>12}{'us/call':>10}{'hits':>10}{'misses':>10}")
+    for mode in ("cold", "warm"):
+        elapsed = asyncio.run(run(mode, credentials, args.iterations))
+        stats = verified_tokens.stats()
+        print(
+            f"{mode:<6}{args.iterations / elapsed:>12.0f}{elapsed / args.iterations * 1e6:>10.2f}"
+            f"{stats['hits']:>10}{stats['misses']:>10}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Database round trips and latency of POST /auth/login, before and after the upsert.
+
+Usage:
+    python -m bench.login_roundtrips [--logins 200]
+
+"before" is the previous handler (SELECT user, SELECT token, DELETE + COMMIT for
+expired tokens, INSERT + COMMIT + refresh), "after" is the current one. Both run
+against the configured database, for a new device, a device with a valid token
+and a device whose token has expired. Round trips count every statement plus
+BEGIN/COMMIT.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("RATELIMIT_ENABLED", "false")
+os.environ.setdefault("SECRET_KEY", "bench-" + "0" * 58)
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy import event, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app import app
+from models.auth import userLogin
+from utils.db import AsyncSessionLocal, engine, get_session, init_db
+from utils.db.schemas import User, UserRefreshToken
+from utils.hashing import hasher
+from utils.jwt import create_jwt_token, create_refresh_token_payload
+
+PASSWORD = "Benchmark_Passw0rd!"
+
+async def legacy_login(data: userLogin, db: AsyncSession = Depends(get_session)):
+    result = await db.execute(select(User).where(User.username == data.username))
+    user = result.scalar_one_or_none()
+    if not user or not await hasher.verify(data.password, user.password):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    result = await db.execute(
+        select(UserRefreshToken).where(
+            UserRefreshToken.user_uuid == user.uuid,
+            UserRefreshToken.device_id == data.device_id
+        )
+    )
+    existing_token = result.scalar_one_or_none()
+    if existing_token and existing_token.expires_at > datetime.now(timezone.utc):
+        return {"refresh_token": existing_token.token}
+    elif existing_token:
+        await db.delete(existing_token)
+        await db.commit()
+
+    token = create_jwt_token(create_refresh_token_payload(user.uuid, data.device_id))
+    new_token = UserRefreshToken(
+        user_uuid=user.uuid,
+        token=token,
+        device_id=data.device_id,
+        expires_at=datetime.now(timezone.utc) + timedelta(days=7)
+    )
+    db.add(new_token)
+    await db.commit()
+    await db.refresh(new_token)
+    return {"refresh_token": token}
+
+class RoundTrips:
+    def __init__(self):
+        self.count = 0
+        sync_engine = engine.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", self.statement)
+        event.listen(sync_engine, "begin", self.transaction)
+        event.listen(sync_engine, "commit", self.transaction)
+        event.listen(sync_engine, "rollback", self.transaction)
+
+    def statement(self, *args):
+        self.count += 1
+
+    def transaction(self, *args):
+        self.count += 1
+
+async def create_user() -> str:
+    username = f"bench_{uuid.uuid4().hex[:20]}"
+    async with AsyncSessionLocal() as db:
+        db.add(User(username=username, password=await hasher.hash(PASSWORD), display_name="bench"))
+        await db.commit()
+    return username
+
+async def expire_tokens(username: str):
+    async with AsyncSessionLocal() as db:
+        user_uuid = (await db.execute(select(User.uuid).where(User.username == username))).scalar_one()
+        await db.execute(
+            update(UserRefreshToken)
+            .where(UserRefreshToken.user_uuid == user_uuid)
+            .values(expires_at=datetime.now(timezone.utc) - timedelta(minutes=1))
+        )
+        await db.commit()
+
+async def measure(client: httpx.AsyncClient, counter: RoundTrips, body: dict, samples: list, trips: list):
+    before = counter.count
+    start = time.perf_counter()
+    response = await client.post("/auth/login", json=body)
+    samples.append(time.perf_counter() - start)
+    trips.append(counter.count - before)
+    response.raise_for_status()
+
+async def run(target: FastAPI, counter: RoundTrips, logins: int) -> dict:
+    username = await create_user()
+    results = {}
+    transport = httpx.ASGITransport(app=target)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for scenario in ("new device", "valid token", "expired token"):
+            samples, trips = [], []
+            for i in range(logins):
+                # The same device ids are reused, so the second pass finds valid tokens.
+                body = {"username": username, "password": PASSWORD, "device_id": f"device-{i}"}
+                if scenario == "expired token":
+                    await expire_tokens(username)
+                await measure(client, counter, body, samples, trips)
+            results[scenario] = {
+                "round_trips": statistics.fmean(trips),
+                "p50_ms": statistics.median(samples) * 1000,
+                "mean_ms": statistics.fmean(samples) * 1000,
+            }
+    return results
+
+async def main_async(logins: int):
+    await init_db()
+    counter = RoundTrips()
+    legacy = FastAPI()
+    legacy.post("/auth/login")(legacy_login)
+
+    print(f"{'flow':<8}{'scenario':<15}{'round trips':>12}{'p50':>10}{'mean':>10}")
+    for name, target in (("before", legacy), ("after", app)):
+        results = await run(target, counter, logins)
+        for scenario, r in results.items():
+            print(f"{name:<8}{scenario:<15}{r['round_trips']:>12.1f}{r['p50_ms']:>8.2f}ms{r['mean_ms']:>8.2f}ms")
+    hasher.shutdown()
+    await engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200, help="Logins per scenario.")
+    args = parser.parse_args()
+    asyncio.run(main_async(args.logins))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Mixed login + /user/me latency with password hashing inline vs in the process pool.
+
+Usage:
+    python -m bench.password_hashing [--duration 10] [--logins 4] [--pollers 16] [--interval 0.01]
+
+Both modes serve the same two routes from one event loop. "inline" verifies PBKDF2
+on the loop the way `data.password == user.password` used to, "pool" goes through
+`utils.hashing.hasher`. Compare the /user/me p99 between the two runs.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy_utils.types.password import Password
+
+from utils.hashing import PasswordHasher, pwd_context
+
+PASSWORD = "Benchmark_Passw0rd!"
+
+def build_app(mode: str, hasher: PasswordHasher) -> FastAPI:
+    app = FastAPI()
+    stored = Password(pwd_context.hash(PASSWORD).encode("utf8"))
+
+    @app.post("/auth/login")
+    async def login():
+        if mode == "inline":
+            ok = pwd_context.verify(PASSWORD, stored.hash)
+        else:
+            ok = await hasher.verify(PASSWORD, stored)
+        return {"ok": ok}
+
+    @app.get("/user/me")
+    async def me():
+        return {"uuid": "00000000-0000-0000-0000-000000000000", "display_name": "bench"}
+
+    return app
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+    return samples[index]
+
+async def worker(client: httpx.AsyncClient, method: str, path: str, deadline: float, samples: list[float], interval: float = 0.0):
+    # Latency is measured from the scheduled start, not the actual one, so time
+    # spent waiting for a blocked loop to come back is counted too.
+    scheduled = time.perf_counter()
+    while scheduled < deadline:
+        response = await client.request(method, path)
+        if response.status_code == 200:
+            samples.append(time.perf_counter() - scheduled)
+        scheduled = max(scheduled + interval, time.perf_counter()) if interval else time.perf_counter()
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+
+async def run(mode: str, duration: float, logins: int, pollers: int, interval: float) -> dict:
+    hasher = PasswordHasher(max_pending=logins * 2)
+    app = build_app(mode, hasher)
+    login_samples: list[float] = []
+    me_samples: list[float] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm the pool so process start-up is not counted.
+        await client.post("/auth/login")
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(
+            *(worker(client, "POST", "/auth/login", deadline, login_samples) for _ in range(logins)),
+            *(worker(client, "GET", "/user/me", deadline, me_samples, interval) for _ in range(pollers)),
+        )
+    hasher.shutdown()
+    return {
+        "mode": mode,
+        "logins": len(login_samples),
+        "me": len(me_samples),
+        "me_p50_ms": percentile(me_samples, 50) * 1000,
+        "me_p99_ms": percentile(me_samples, 99) * 1000,
+        "login_p99_ms": percentile(login_samples, 99) * 1000,
+        "me_mean_ms": (statistics.fmean(me_samples) * 1000) if me_samples else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run each mode.")
+    parser.add_argument("--logins", type=int, default=4, help="Concurrent login clients.")
+    parser.add_argument("--pollers", type=int, default=16, help="Concurrent /user/me clients.")
+    parser.add_argument("--interval", type=float, default=0.01, help="Pause between /user/me polls per client, in seconds.")
+    args = parser.parse_args()
+
+    print(f"{'mode':<8}{'logins':>8}{'/me reqs':>10}{'/me p50':>10}{'/me p99':>10}{'login p99':>11}")
+    for mode in ("inline", "pool"):
+        r = asyncio.run(run(mode, args.duration, args.logins, args.pollers, args.interval))
+        print(
+            f"{r['mode']:<8}{r['logins']:>8}{r['me']:>10}"
+            f"{r['me_p50_ms']:>8.2f}ms{r['me_p99_ms']:>8.2f}ms{r['login_p99_ms']:>9.2f}ms"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Load test showing rate limits hold exactly across worker processes.
+
+Usage:
+    python -m bench.ratelimit_workers [--workers 4] [--clients 200] [--hits 20] [--limit "5/minute"]
+
+Every worker process hammers the same set of client keys through the limits
+fixed-window strategy, the way slowapi does for `/auth/login`. With the shared
+memory storage each key must be allowed exactly `limit` times in total, with
+the default in-memory storage it is allowed up to `workers * limit` times.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+import middleware.shm_storage  # noqa: F401, registers shm://
+
+def hammer(uri: str, limit: str, clients: int, hits: int, start_at: float) -> list[int]:
+    limiter = FixedWindowRateLimiter(storage_from_string(uri))
+    item = parse(limit)
+    allowed = [0] * clients
+    while time.time() < start_at:
+        pass
+    for _ in range(hits):
+        for client in range(clients):
+            if limiter.hit(item, "/auth/login", f"10.0.{client // 256}.{client % 256}"):
+                allowed[client] += 1
+    return allowed
+
+def run(uri: str, workers: int, limit: str, clients: int, hits: int) -> tuple[list[int], float]:
+    start_at = time.time() + 1.0
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        results = pool.starmap(hammer, [(uri, limit, clients, hits, start_at)] * workers)
+    allowed = [sum(per_worker[client] for per_worker in results) for client in range(clients)]
+    return allowed, time.time() - start_at
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes.")
+    parser.add_argument("--clients", type=int, default=200, help="Distinct client keys.")
+    parser.add_argument("--hits", type=int, default=20, help="Hits per client per worker.")
+    parser.add_argument("--limit", type=str, default="5/minute", help="Rate limit under test.")
+    args = parser.parse_args()
+    expected = parse(args.limit).amount
+
+    path = os.path.join(tempfile.mkdtemp(), "ratelimit")
+    total_hits = args.workers * args.clients * args.hits
+    ok = True
+    for name, uri in (("memory", "memory://"), ("shm", f"shm://{path}")):
+        allowed, elapsed = run(uri, args.workers, args.limit, args.clients, args.hits)
+        exact = all(a == expected for a in allowed)
+        print(
+            f"{name:<7} hits={total_hits} in {elapsed:.2f}s ({total_hits / elapsed:.0f}/s) "
+            f"allowed per key min={min(allowed)} max={max(allowed)} expected={expected} "
+            f"{'EXACT' if exact else 'OVER LIMIT'}"
+        )
+        if name == "shm":
+            ok = exact
+    os.remove(path)
+    raise SystemExit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+End-to-end load scenarios against the real app, with baselines to catch regressions.
+
+Usage:
+    python -m bench.run [--db sqlite|postgres|<url>] [--requests 200] [--concurrency 16]
+                        [--scenario NAME ...] [--save NAME] [--compare NAME] [--tolerance 0.2]
+
+Scenarios: register_storm, login_storm, refresh_revoke_churn (refresh, rotate, revoke,
+then use the revoked session) and me_polling. Each reports throughput, p50/p95/p99 latency
+and SQL statements per request. The app runs in-process with its lifespan started, so no
+server or Postgres is needed by default; `--db postgres` starts a throwaway local cluster.
+
+`--save NAME` writes bench/baselines/NAME.json, `--compare NAME` diffs against it and exits
+with status 1 when p99 latency or throughput moved by more than `--tolerance`, or any
+scenario issues more statements per request. Baselines are only comparable on the same
+machine and database backend.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+
+from bench.harness import Harness, configure_environment, database
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+def baseline_path(name: str) -> str:
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, now in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        if now["p99_ms"] > before["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {before['p99_ms']:.1f} -> {now['p99_ms']:.1f} ms")
+        if now["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['throughput_rps']:.1f} -> {now['throughput_rps']:.1f} req/s")
+        if now["queries_per_request"] > before["queries_per_request"] + 0.01:
+            regressions.append(f"{name}: queries/request {before['queries_per_request']:.2f} -> {now['queries_per_request']:.2f}")
+        if now["errors"] > before["errors"]:
+            regressions.append(f"{name}: errors {before['errors']} -> {now['errors']}")
+    return regressions
+
+async def run(args) -> dict:
+    from bench.scenarios import SCENARIOS
+    from utils.db import DATABASE_BACKEND
+
+    report = {
+        "meta": {
+            "database": DATABASE_BACKEND,
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "scenarios": {},
+    }
+    async with Harness() as h:
+        for name in args.scenario or SCENARIOS:
+            result = await SCENARIOS[name](h, args.requests, args.concurrency)
+            summary = report["scenarios"][name] = result.summary()
+            print(
+                f"{name:22} {summary['requests']:6} req  {summary['throughput_rps']:8.1f} req/s  "
+                f"p50 {summary['p50_ms']:7.1f}  p95 {summary['p95_ms']:7.1f}  p99 {summary['p99_ms']:7.1f} ms  "
+                f"{summary['queries_per_request']:5.2f} q/req  {summary['errors']} errors"
+            )
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--db", default="sqlite", help="sqlite (default), postgres (local throwaway cluster) or a database URL")
+    parser.add_argument("--requests", type=int, default=200, help="Timed requests or operations per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--scenario", action="append", help="Run only this scenario, may be repeated")
+    parser.add_argument("--save", metavar="NAME", help="Write the results to bench/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="Compare against bench/baselines/NAME.json")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative change in p99 and throughput")
+    args = parser.parse_args()
+
+    configure_environment()
+    with database(args.db) as url:
+        print(f"Database: {url}")
+        report = asyncio.run(run(args))
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path(args.save), "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline {baseline_path(args.save)}")
+
+    if args.compare:
+        with open(baseline_path(args.compare)) as f:
+            baseline = json.load(f)
+        if baseline["meta"]["database"] != report["meta"]["database"]:
+            print(f"Warning: baseline was recorded on {baseline['meta']['database']}")
+        regressions = compare(report, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.compare}")
+
+if __name__ == "__main__":
+    main()
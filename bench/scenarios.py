@@ -0,0 +1,89 @@
+"""
+Scripted load scenarios for `python -m bench.run`.
+Each scenario does its untimed setup, then returns the Result of its timed phase.
+"""
+import uuid
+
+from bench.harness import Harness, Result
+
+PASSWORD = "Benchmark_Passw0rd!"
+
+def _username() -> str:
+    return f"bench_{uuid.uuid4().hex[:24]}"
+
+async def _register(h: Harness, result: Result, username: str):
+    await h.request(result, "POST", "/auth/register", json={
+        "username": username, "password": PASSWORD, "display_name": "bench",
+    })
+
+async def _login(h: Harness, result: Result, username: str, device_id: str) -> dict:
+    response = await h.request(result, "POST", "/auth/login", json={
+        "username": username, "password": PASSWORD, "device_id": device_id,
+    })
+    return response.json()
+
+async def _setup_users(h: Harness, count: int, concurrency: int) -> list[str]:
+    usernames = [_username() for _ in range(count)]
+    await h.drive("setup", [lambda r, u=u: _register(h, r, u) for u in usernames], concurrency)
+    return usernames
+
+async def register_storm(h: Harness, requests: int, concurrency: int) -> Result:
+    operations = [lambda r, u=_username(): _register(h, r, u) for _ in range(requests)]
+    return await h.drive("register_storm", operations, concurrency)
+
+async def login_storm(h: Harness, requests: int, concurrency: int) -> Result:
+    usernames = await _setup_users(h, max(1, requests // 10), concurrency)
+    operations = [
+        lambda r, i=i: _login(h, r, usernames[i % len(usernames)], f"device-{i % 3}")
+        for i in range(requests)
+    ]
+    return await h.drive("login_storm", operations, concurrency)
+
+async def refresh_revoke_churn(h: Harness, requests: int, concurrency: int) -> Result:
+    usernames = await _setup_users(h, max(1, requests // 40), concurrency)
+    sessions = []
+
+    async def open_session(r: Result, username: str, device_id: str):
+        sessions.append((device_id, await _login(h, r, username, device_id)))
+
+    await h.drive("setup", [
+        lambda r, i=i: open_session(r, usernames[i % len(usernames)], f"churn-{i}")
+        for i in range(max(1, requests // 4))
+    ], concurrency)
+
+    async def churn(r: Result, device_id: str, login: dict):
+        refresh_token = login["refresh_token"]
+        await h.request(r, "POST", "/token/refresh", json={
+            "device_id": device_id, "refresh_token": refresh_token, "type": "access_token",
+        })
+        rotated = await h.request(r, "POST", "/token/refresh", json={
+            "device_id": device_id, "refresh_token": refresh_token, "type": "refresh_token",
+        })
+        if rotated.status_code == 200:
+            refresh_token = rotated.json()["refresh_token"]
+        await h.request(r, "POST", "/token/revoke", json={"device_id": device_id, "refresh_token": refresh_token})
+        await h.request(r, "GET", "/user/me", expect=401, headers={"Authorization": f"Bearer {login['access_token']}"})
+
+    return await h.drive("refresh_revoke_churn", [
+        lambda r, s=s: churn(r, *s) for s in sessions
+    ], concurrency)
+
+async def me_polling(h: Harness, requests: int, concurrency: int) -> Result:
+    usernames = await _setup_users(h, max(1, requests // 50), concurrency)
+    tokens = []
+
+    async def sign_in(r: Result, username: str):
+        tokens.append((await _login(h, r, username, "poller"))["access_token"])
+
+    await h.drive("setup", [lambda r, u=u: sign_in(r, u) for u in usernames], concurrency)
+    return await h.drive("me_polling", [
+        lambda r, t=tokens[i % len(tokens)]: h.request(r, "GET", "/user/me", headers={"Authorization": f"Bearer {t}"})
+        for i in range(requests)
+    ], concurrency)
+
+SCENARIOS = {
+    "register_storm": register_storm,
+    "login_storm": login_storm,
+    "refresh_revoke_churn": refresh_revoke_churn,
+    "me_polling": me_polling,
+}
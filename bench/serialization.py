@@ -0,0 +1,96 @@
+"""
+Per-route cost of turning a handler's return value into JSON bytes, before and after response models.
+
+Usage:
+    python -m bench.serialization [--iterations 20000]
+
+"before" is the previous path: a dict with `.isoformat()` strings run through
+`jsonable_encoder` and rendered by `JSONResponse` (stdlib json). "after" is what
+FastAPI now does for routes with a response model and the default response class:
+validate the returned model and dump it to JSON bytes in pydantic-core. Both use
+FastAPI's own `serialize_response` with each route's real response field.
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("RATELIMIT_ENABLED", "false")
+os.environ.setdefault("SECRET_KEY", "bench-" + "0" * 58)
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+from routers.auth import auth
+from routers.token import token
+from routers.user import user
+from models.auth import loginResponse, registerResponse
+from models.token import AccessTokenResponse, RotatedTokenResponse, RevokeResponse
+from models.user import cachedProfile
+
+def payloads() -> dict[tuple[str, str], object]:
+    now = datetime.now(timezone.utc)
+    jwt_token = "eyJ" + "x" * 300
+    user_uuid = str(uuid.uuid4())
+    return {
+        ("/auth/login", "login"): loginResponse(
+            message="Login successful", user_uuid=user_uuid, refresh_token=jwt_token, access_token=jwt_token,
+            access_token_expires_at=now + timedelta(minutes=15), device_id="device-1",
+            created_at=now, expires_at=now + timedelta(days=7),
+        ),
+        ("/auth/register", "register"): registerResponse(message="Registration successful", uuid=user_uuid),
+        ("/token/refresh", "access"): AccessTokenResponse(
+            message="Access token refreshed successfully", access_token=jwt_token,
+            access_token_expires_at=now + timedelta(minutes=15),
+        ),
+        ("/token/refresh", "rotate"): RotatedTokenResponse(
+            message="Refresh token rotated successfully", refresh_token=jwt_token, device_id="device-1",
+            created_at=now, expires_at=now + timedelta(days=7), access_token=jwt_token,
+            access_token_expires_at=now + timedelta(minutes=15),
+        ),
+        ("/token/revoke", "revoke"): RevokeResponse(message="Refresh token cancelled successfully"),
+        ("/user/me", "profile"): cachedProfile(
+            uuid=user_uuid, username="benchmark_user", display_name="Benchmark", avatar_url="default_avatar.png",
+            is_online=False, last_online_at=now, registered_at=now - timedelta(days=30), profile_version=3,
+        ),
+    }
+
+def legacy_dict(model) -> dict:
+    return {k: v.isoformat() if isinstance(v, datetime) else v for k, v in model.model_dump().items()}
+
+async def before(content: dict) -> bytes:
+    return JSONResponse(await serialize_response(response_content=content)).body
+
+async def after(field, content) -> bytes:
+    return await serialize_response(field=field, response_content=content, dump_json=True)
+
+async def timed(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await fn()
+    return (time.perf_counter() - start) / iterations
+
+async def run(iterations: int):
+    fields = {
+        route.path: route.response_field
+        for router in (auth, token, user) for route in router.routes if isinstance(route, APIRoute)
+    }
+    print(f"{'route':28} {'before':>10} {'after':>10} {'speedup':>8}")
+    for (path, variant), model in payloads().items():
+        content = legacy_dict(model)
+        field = fields[path]
+        await before(content), await after(field, model)
+        t_before = await timed(lambda: before(content), iterations)
+        t_after = await timed(lambda: after(field, model), iterations)
+        print(f"{path + ' (' + variant + ')':28} {t_before * 1e6:8.2f}us {t_after * 1e6:8.2f}us {t_before / t_after:7.1f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Response serialization cost per route.")
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(run(args.iterations))
+
+if __name__ == "__main__":
+    main()
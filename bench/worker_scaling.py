@@ -0,0 +1,110 @@
+"""
+Requests/sec scaling of the production launcher from 1 to N workers.
+
+Usage:
+    python -m bench.worker_scaling [--max-workers 4] [--duration 10] [--connections 64]
+
+For each worker count the server is started through `launch.py`, warmed up and
+then loaded on `/` and `/utils/getHostname` by separate client processes.
+The app still connects to the configured database at startup, and rate limiting
+is switched off for the server (RATELIMIT_ENABLED=false) so 429s do not
+flatter the numbers.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROUTES = ["/", "/utils/getHostname"]
+
+async def load(url: str, route: str, connections: int, duration: float) -> tuple[int, int]:
+    done = errors = 0
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(base_url=url, limits=limits) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal done, errors
+            while time.perf_counter() < deadline:
+                try:
+                    response = await client.get(route)
+                    if response.status_code == 200:
+                        done += 1
+                    else:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+
+        await asyncio.gather(*(worker() for _ in range(connections)))
+    return done, errors
+
+def client_process(url: str, route: str, connections: int, duration: float) -> tuple[int, int]:
+    return asyncio.run(load(url, route, connections, duration))
+
+def wait_ready(url: str, server: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode} before becoming ready")
+        try:
+            if httpx.get(url + "/").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become ready")
+
+def run(workers: int, port: int, duration: float, connections: int, clients: int) -> dict:
+    env = dict(os.environ, RATELIMIT_ENABLED="false")
+    env.setdefault("SECRET_KEY", "bench-" + "0" * 58)
+    server = subprocess.Popen(
+        [sys.executable, "launch.py", "--port", str(port), "--host", "127.0.0.1",
+         "--workers", str(workers)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_ready(url, server)
+        results = {}
+        with multiprocessing.get_context("spawn").Pool(clients) as pool:
+            for route in ROUTES:
+                pool.starmap(client_process, [(url, route, connections // clients, 1.0)] * clients)
+                counts = pool.starmap(client_process, [(url, route, connections // clients, duration)] * clients)
+                done = sum(c[0] for c in counts)
+                errors = sum(c[1] for c in counts)
+                results[route] = {"rps": done / duration, "errors": errors}
+        return results
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1, help="Largest worker count to test.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per route and worker count.")
+    parser.add_argument("--connections", type=int, default=64, help="Concurrent connections in total.")
+    parser.add_argument("--clients", type=int, default=2, help="Load generator processes.")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the server under test.")
+    args = parser.parse_args()
+
+    print(f"{'workers':>8}" + "".join(f"{route + ' req/s':>26}" for route in ROUTES))
+    baseline = {}
+    for workers in range(1, args.max_workers + 1):
+        results = run(workers, args.port, args.duration, args.connections, args.clients)
+        row = f"{workers:>8}"
+        for route in ROUTES:
+            rps = results[route]["rps"]
+            baseline.setdefault(route, rps)
+            row += f"{rps:>16.0f} ({rps / baseline[route]:.2f}x)"
+        print(row)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+from utils.db import engine, AsyncSessionLocal
+from utils.db.invites import generate
+
+# Admin tool, creates invite codes in bulk and writes them to stdout, one per line.
+#   python generate_invites.py --count 10000 --max-uses 1 --expires-in-days 30 > codes.txt
+
+async def main(count: int, max_uses: int | None, expires_at: datetime | None, chunk_size: int):
+    start = time.perf_counter()
+    created = 0
+    async with AsyncSessionLocal() as db:
+        async for codes in generate(db, count, max_uses=max_uses, expires_at=expires_at, chunk_size=chunk_size):
+            sys.stdout.write("".join(f"{code}\n" for code in codes))
+            created += len(codes)
+    print(f"{created:,} invite codes created in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    await engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create invite codes in bulk.")
+    parser.add_argument("--count", type=int, required=True, help="Number of codes to create.")
+    parser.add_argument("--max-uses", type=int, default=1, help="Registrations per code, 0 for unlimited.")
+    parser.add_argument("--expires-in-days", type=float, help="Optional, days until the codes expire.")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Codes per INSERT statement, at most 5000 (six bound parameters per code).")
+    args = parser.parse_args()
+    if args.count < 1:
+        parser.error("--count must be at least 1")
+    if args.max_uses < 0:
+        parser.error("--max-uses must not be negative")
+    if not 1 <= args.chunk_size <= 5000:
+        parser.error("--chunk-size must be between 1 and 5000")
+
+    expires_at = datetime.now(timezone.utc) + timedelta(days=args.expires_in_days) if args.expires_in_days else None
+    asyncio.run(main(args.count, args.max_uses or None, expires_at, args.chunk_size))
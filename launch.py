@@ -2,17 +2,45 @@ if __name__ == "__main__":
     import os
     import uvicorn
     import argparse
-    
+
     parser = argparse.ArgumentParser(description="Launch the AstroEyes server.")
     parser.add_argument("--host", type=str, default="0.0.0.0", help="Host to run the server on.")
     parser.add_argument("--port", type=int, default=8000, help="Port to run the server on.")
     parser.add_argument("--dev", action="store_true", help="Run in development mode with auto-reload.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes, defaults to the CPU count.")
+    parser.add_argument("--loop", type=str, choices=["auto", "asyncio", "uvloop"], default="uvloop", help="Event loop implementation.")
+    parser.add_argument("--http", type=str, choices=["auto", "h11", "httptools"], default="httptools", help="HTTP protocol implementation.")
+    parser.add_argument("--backlog", type=int, default=2048, help="Maximum number of pending connections in the listen queue.")
+    parser.add_argument("--keep-alive", type=int, default=5, help="Seconds to keep idle keep-alive connections open.")
+    parser.add_argument("--limit-concurrency", type=int, default=None, help="Maximum concurrent connections per worker before answering 503.")
+    parser.add_argument("--graceful-timeout", type=int, default=30, help="Seconds to drain in-flight requests after SIGTERM.")
+    parser.add_argument("--uvicorn-access-log", action="store_true", help="Also write uvicorn's own access log, the app already logs sampled structured access records.")
     args = parser.parse_args()
 
     if args.dev:
         print("Running in development mode...")
         uvicorn.run("app:app", reload=True, log_level="debug")
     else:
-        print("Running in production mode...")
-        uvicorn.run("app:app", host=args.host, port=args.port, log_level="info")
-    
\ No newline at end of file
+        # Every worker starts its own process pools, sized by the number of workers sharing the CPUs.
+        os.environ["WEB_CONCURRENCY"] = str(args.workers)
+        # Installs the queue-based log handler in the supervisor process as well.
+        import utils.log
+        print(f"Running in production mode with {args.workers} worker(s), loop={args.loop}, http={args.http}...")
+        # On SIGTERM uvicorn stops accepting connections and lets in-flight requests finish
+        # for up to --graceful-timeout seconds before the lifespan shutdown runs.
+        uvicorn.run(
+            "app:app",
+            host=args.host,
+            port=args.port,
+            log_level="info",
+            workers=args.workers,
+            loop=args.loop,
+            http=args.http,
+            backlog=args.backlog,
+            timeout_keep_alive=args.keep_alive,
+            limit_concurrency=args.limit_concurrency,
+            timeout_graceful_shutdown=args.graceful_timeout,
+            access_log=args.uvicorn_access_log,
+            # Leave uvicorn's loggers without handlers so their records go through the app's log queue.
+            log_config=None,
+        )
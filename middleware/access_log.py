@@ -0,0 +1,73 @@
+import random
+import time
+import uuid
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from utils.config import config
+from utils.log import logger, request_id
+from utils.metrics import route_label
+
+class AccessLogMiddleware:
+    """
+    Pure ASGI middleware assigning each request an id and writing a sampled, structured access record.
+    The id comes from the X-Request-ID header when the client sends one, and is echoed in the response.
+    Sampling is per route template (LOG_ACCESS_ROUTE_SAMPLE_RATES, falling back to LOG_ACCESS_SAMPLE_RATE),
+    server errors and requests slower than LOG_SLOW_REQUEST_MS are always logged.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.sample_rate = config.log_access_sample_rate
+        self.route_sample_rates = config.log_access_route_sample_rates
+        self.slow_request = config.log_slow_request_ms / 1000
+
+    def sampled(self, route: str, status: int, latency: float) -> bool:
+        if status >= 500 or latency >= self.slow_request:
+            return True
+        rate = self.route_sample_rates.get(route, self.sample_rate)
+        return rate >= 1 or random.random() < rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rid = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                rid = value.decode("latin-1")[:64]
+                break
+        rid = rid or uuid.uuid4().hex
+        header = (b"x-request-id", rid.encode("latin-1"))
+
+        status = 500
+        start = time.perf_counter()
+        # Arrival time for the admission deadline, this middleware is the outermost one.
+        scope["arrived_at"] = time.monotonic()
+        token = request_id.set(rid)
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), header]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            latency = time.perf_counter() - start
+            route = route_label(scope)
+            if self.sampled(route, status, latency):
+                client = scope.get("client")
+                logger.info(
+                    f"{scope['method']} {scope['path']} {status}",
+                    extra={
+                        "request_id": rid,
+                        "route": route,
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status,
+                        "latency_ms": round(latency * 1000, 3),
+                        "client": client[0] if client else None,
+                    },
+                )
+            request_id.reset(token)
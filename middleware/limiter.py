@@ -1,4 +1,13 @@
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
+from utils.config import config
+import middleware.shm_storage  # registers the shm:// storage scheme
 
-limiter = Limiter(key_func=get_remote_address)
\ No newline at end of file
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=config.ratelimit_storage_uri,
+    enabled=config.ratelimit_enabled,
+)
+
+# slowapi also reads RATELIMIT_ENABLED from the environment, without casting "false" to a bool.
+limiter.enabled = config.ratelimit_enabled
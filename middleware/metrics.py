@@ -0,0 +1,35 @@
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from utils.metrics import current_scope, http_latency, http_requests, route_label
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording per-route latency histograms and status counts.
+    Routes are labelled with their path template, not the raw path, to keep label cardinality bounded.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+        scope.setdefault("arrived_at", time.monotonic())
+        token = current_scope.set(scope)
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_scope.reset(token)
+            route = route_label(scope)
+            http_latency.observe(time.perf_counter() - start, scope["method"], route)
+            http_requests.inc(scope["method"], route, status)
@@ -0,0 +1,147 @@
+import asyncio
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from utils.config import config
+from utils.log import logger, request_id
+from utils.metrics import route_label
+
+MAX_DEPTH = 128
+# Request ids come from the client, only safe ones end up in file names.
+SAFE_NAME = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename.replace("\\", "/").split("/")
+    return f"{code.co_qualname} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+class StackSampler(threading.Thread):
+    """
+    Samples the event loop thread's stack every `interval` seconds while `task` runs on it.
+    Samples taken while the loop is idle or runs another task are counted as `[idle]` / `[other tasks]`,
+    so the profile covers the request's wall time: its own CPU work, waiting on I/O and queuing
+    behind other requests. Work in thread or process pools shows up as waiting.
+    When no sample was taken yet, `stop` takes one from the request's task itself, so requests
+    shorter than `interval` still get a profile.
+    On stop, the stacks are written in collapsed format (`root;caller;callee count`, the input of
+    flamegraph.pl, speedscope or inferno) to `path`, from this thread.
+    """
+    def __init__(self, task: asyncio.Task, interval: float, max_duration: float, path: str, on_done):
+        super().__init__(name="profiler", daemon=True)
+        self.loop = task.get_loop()
+        self.task = task
+        self.thread_id = threading.get_ident()
+        self.interval = interval
+        self.max_duration = max_duration
+        self.path = path
+        self.on_done = on_done
+        self.root = "request"
+        self.stacks: Counter[tuple[str, ...]] = Counter()
+        self.stopped = threading.Event()
+
+    def sample(self, frame=None):
+        current = asyncio.current_task(self.loop)
+        if current is not self.task:
+            self.stacks[("[idle]" if current is None else "[other tasks]",)] += 1
+            return
+        if frame is None:
+            frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None and len(stack) < MAX_DEPTH:
+            stack.append(_frame_name(frame))
+            frame = frame.f_back
+        self.stacks[tuple(reversed(stack))] += 1
+
+    def run(self):
+        deadline = time.monotonic() + self.max_duration
+        try:
+            while not self.stopped.wait(self.interval) and time.monotonic() < deadline:
+                self.sample()
+            if not self.stacks:
+                return
+            with open(self.path, "w", encoding="utf8") as file:
+                for stack, count in self.stacks.most_common():
+                    file.write(f"{';'.join((self.root, *stack))} {count}\n")
+        except Exception as e:
+            logger.error(f"Writing profile {self.path} failed: {e}")
+        finally:
+            self.on_done()
+
+    def stop(self, root: str):
+        # Called on the event loop thread by the request's task, so the caller's frame is a valid sample.
+        if not self.stacks:
+            self.sample(sys._getframe(1))
+        self.root = root
+        self.stopped.set()
+
+class ProfilerMiddleware:
+    """
+    Pure ASGI middleware profiling a fraction of requests (PROFILE_SAMPLE_RATE) and requests sending
+    `X-Profile: <PROFILE_TOKEN>`, with a `StackSampler` per request. Profiles are written to PROFILE_DIR
+    as `<time>-<request id>.folded`, keeping the newest PROFILE_MAX_FILES, and the file name is returned
+    in `X-Profile-File`. At most PROFILE_MAX_ACTIVE requests are profiled at once per worker.
+    Only added to the app when profiling is enabled, so it costs nothing otherwise.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.sample_rate = config.profile_sample_rate
+        self.token = config.profile_token.encode()
+        self.directory = config.profile_dir
+        self.max_files = config.profile_max_files
+        self.max_active = config.profile_max_active
+        self.interval = config.profile_interval_ms / 1000
+        self.max_duration = config.profile_max_seconds
+        self.active = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def requested(self, scope: Scope) -> bool:
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == b"x-profile":
+                    return hmac.compare_digest(value, self.token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _prune(self):
+        # Runs on the sampler thread, after the profile is written.
+        try:
+            entries = sorted(
+                (entry for entry in os.scandir(self.directory) if entry.name.endswith(".folded")),
+                key=lambda entry: entry.stat().st_mtime,
+            )
+            for entry in entries[:-self.max_files]:
+                os.remove(entry.path)
+        except OSError as e:
+            logger.warning(f"Pruning profiles failed: {e}")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or self.active >= self.max_active or not self.requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        rid = request_id.get()
+        if rid is None or not SAFE_NAME.fullmatch(rid):
+            rid = os.urandom(8).hex()
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{rid}.folded"
+        header = (b"x-profile-file", name.encode("latin-1"))
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), header]
+            await send(message)
+
+        self.active += 1
+        sampler = StackSampler(
+            asyncio.current_task(), self.interval, self.max_duration, os.path.join(self.directory, name), self._prune
+        )
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop(f"{scope['method']} {route_label(scope)}")
+            self.active -= 1
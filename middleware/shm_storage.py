@@ -0,0 +1,157 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import urllib.parse
+from limits.storage import Storage
+
+SLOT = struct.Struct("<QdQ")  # key digest, expiry (unix time), counter
+STRIPE_SLOTS = 8
+# Returned by `incr` when a key finds no free slot, above any limit.
+FULL = 2**63 - 1
+
+def default_path() -> str:
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "astroeyes-ratelimit")
+
+class SharedMemoryStorage(Storage):
+    """
+    Rate limit storage shared by every worker process on the host.
+    Counters live in a fixed-size table of slots inside a memory-mapped file, so memory does not grow
+    with the number of clients. The table is split into stripes of 8 slots, a key always hashes to the
+    same stripe and every update holds an exclusive `fcntl` lock on that stripe's byte range, which makes
+    `incr` atomic across processes without a global lock.
+    Only slots whose window has expired are reused. A live counter is never evicted, a reset counter
+    would let a client through, so a key whose stripe is full of live keys counts as over its limit
+    until a slot expires; size `slots` for the expected number of clients times limits per window.
+    The file must be owned by the server's user, and every worker must use the same `slots`.
+    URI:
+        shm:///dev/shm/astroeyes-ratelimit?slots=65536
+    """
+    STORAGE_SCHEME = ["shm"]
+
+    def __init__(self, uri: str | None = None, wrap_exceptions: bool = False, **options):
+        parsed = urllib.parse.urlparse(uri or "shm://")
+        query = urllib.parse.parse_qs(parsed.query)
+        self.path = parsed.path or default_path()
+        slots = int(options.get("slots") or query.get("slots", [65536])[0])
+        self.stripes = max(1, slots // STRIPE_SLOTS)
+        self.size = self.stripes * STRIPE_SLOTS * SLOT.size
+
+        # The directory is shared with other local users: never follow a planted symlink, nor use their file.
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        try:
+            stat = os.fstat(self._fd)
+            if stat.st_uid != os.getuid():
+                raise RuntimeError(f"Rate limit table {self.path} is owned by another user")
+            # Other workers may have the file mapped already, resizing it under them would crash them with SIGBUS.
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                size = os.fstat(self._fd).st_size
+                if size == 0:
+                    os.ftruncate(self._fd, self.size)
+                elif size != self.size:
+                    raise RuntimeError(
+                        f"Rate limit table {self.path} holds {size // SLOT.size} slots, not the configured "
+                        f"{self.size // SLOT.size}; stop every worker and remove it to change the size"
+                    )
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        except BaseException:
+            os.close(self._fd)
+            raise
+        self._map = mmap.mmap(self._fd, self.size)
+        # fcntl locks are held per process, the thread lock keeps threads of one worker apart.
+        self._thread_lock = threading.Lock()
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return OSError
+
+    def _locate(self, key: str) -> tuple[int, int]:
+        digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+        return digest, (digest % self.stripes) * STRIPE_SLOTS * SLOT.size
+
+    def _locked(self, start: int, fn, length: int = STRIPE_SLOTS * SLOT.size):
+        with self._thread_lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start)
+            try:
+                return fn()
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+
+    def _find(self, digest: int, start: int, now: float) -> int | None:
+        for offset in range(start, start + STRIPE_SLOTS * SLOT.size, SLOT.size):
+            slot_digest, expiry, _ = SLOT.unpack_from(self._map, offset)
+            if slot_digest == digest and expiry > now:
+                return offset
+        return None
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        digest, start = self._locate(key)
+
+        def update() -> int:
+            now = time.time()
+            offset = self._find(digest, start, now)
+            if offset is not None:
+                _, slot_expiry, count = SLOT.unpack_from(self._map, offset)
+                SLOT.pack_into(self._map, offset, digest, slot_expiry, count + amount)
+                return count + amount
+
+            for offset in range(start, start + STRIPE_SLOTS * SLOT.size, SLOT.size):
+                slot_digest, slot_expiry, _ = SLOT.unpack_from(self._map, offset)
+                if slot_digest == 0 or slot_expiry <= now:
+                    SLOT.pack_into(self._map, offset, digest, now + expiry, amount)
+                    return amount
+            return FULL
+
+        return self._locked(start, update)
+
+    def get(self, key: str) -> int:
+        digest, start = self._locate(key)
+
+        def read() -> int:
+            offset = self._find(digest, start, time.time())
+            return 0 if offset is None else SLOT.unpack_from(self._map, offset)[2]
+
+        return self._locked(start, read)
+
+    def get_expiry(self, key: str) -> float:
+        digest, start = self._locate(key)
+
+        def read() -> float:
+            now = time.time()
+            offset = self._find(digest, start, now)
+            return now if offset is None else SLOT.unpack_from(self._map, offset)[1]
+
+        return self._locked(start, read)
+
+    def clear(self, key: str) -> None:
+        digest, start = self._locate(key)
+
+        def wipe():
+            offset = self._find(digest, start, time.time())
+            if offset is not None:
+                SLOT.pack_into(self._map, offset, 0, 0.0, 0)
+
+        self._locked(start, wipe)
+
+    def check(self) -> bool:
+        return not self._map.closed
+
+    def reset(self) -> int | None:
+        def wipe() -> int:
+            now = time.time()
+            live = 0
+            for offset in range(0, self.size, SLOT.size):
+                slot_digest, expiry, _ = SLOT.unpack_from(self._map, offset)
+                live += bool(slot_digest and expiry > now)
+            self._map[:] = bytes(self.size)
+            return live
+
+        return self._locked(0, wipe, self.size)
@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel, Field, field_validator
 from utils.validator import validate_password_strength
 
@@ -20,10 +21,14 @@ class userRegister(userBase):
     Model for user registration.
     Fields:
         display_name: 1-32 characters, allows letters, numbers, and underscores.
-        invite_code: Optional invite code for registration.
+        invite_code: Optional invite code for registration, blank is the same as absent.
     """
     display_name: str = Field(min_length=1, max_length=32)
-    invite_code: str | None = None
+    invite_code: str | None = Field(None, max_length=32)
+
+    @field_validator("invite_code")
+    def blank_invite_code_is_absent(cls, v):
+        return v.strip() or None if v is not None else None
 
 class userLogin(userBase):
     """
@@ -31,3 +36,25 @@ class userLogin(userBase):
     Inherits from UserBase.
     """
     device_id: str  = Field(max_length=64)
+
+class loginResponse(BaseModel):
+    """
+    Response of a successful login, `created_at` and `expires_at` belong to the refresh token.
+    """
+    message: str
+    user_uuid: str
+    refresh_token: str
+    access_token: str
+    access_token_expires_at: datetime
+    device_id: str
+    created_at: datetime
+    expires_at: datetime
+
+class registerResponse(BaseModel):
+    message: str
+    uuid: str
+
+
+class usernameAvailability(BaseModel):
+    username: str
+    available: bool
@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel, Field
 from enum import Enum
 
@@ -13,4 +14,18 @@ class RefreshType(str, Enum):
     REFRESH_TOKEN = "refresh_token"
 
 class RefreshToken(RefreshTokenBase):
-    type: RefreshType
\ No newline at end of file
+    type: RefreshType
+
+class RevokeResponse(BaseModel):
+    message: str
+
+class AccessTokenResponse(BaseModel):
+    message: str
+    access_token: str
+    access_token_expires_at: datetime
+
+class RotatedTokenResponse(AccessTokenResponse):
+    refresh_token: str
+    device_id: str
+    created_at: datetime
+    expires_at: datetime
@@ -1,5 +1,6 @@
+from datetime import datetime
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional
+from typing import Annotated, Optional
 from utils.validator import validate_password_strength
 
 class updateProfile(BaseModel):
@@ -12,3 +13,49 @@ class updatePassword(BaseModel):
     @field_validator("new_password")
     def validate_password_strength(cls, v):
         return validate_password_strength(v)
+
+class userProfile(BaseModel):
+    """
+    Profile returned by GET /user/me.
+    """
+    uuid: str
+    username: str
+    display_name: str
+    avatar_url: str | None
+    is_online: bool
+    last_online_at: datetime
+    registered_at: datetime
+
+class cachedProfile(userProfile):
+    """
+    Value kept in the profile cache, with the version its ETag is derived from. Not part of the response.
+    """
+    profile_version: int
+
+class updateProfileResponse(BaseModel):
+    message: str
+    display_name: str
+
+class avatarResponse(BaseModel):
+    message: str
+    avatar_url: str
+
+class messageResponse(BaseModel):
+    message: str
+
+class batchUsers(BaseModel):
+    """
+    Model for resolving several users at once.
+    Fields:
+        uuids: 1-200 user UUIDs, duplicates are ignored.
+    """
+    uuids: list[Annotated[str, Field(max_length=36)]] = Field(min_length=1, max_length=200)
+
+class publicProfile(BaseModel):
+    username: str
+    display_name: str
+    avatar_url: str | None
+
+class batchUsersResponse(BaseModel):
+    users: dict[str, publicProfile]
+    missing: list[str]
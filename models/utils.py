@@ -0,0 +1,4 @@
+from pydantic import BaseModel
+
+class hostnameResponse(BaseModel):
+    hostname: str | None
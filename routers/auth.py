@@ -1,22 +1,25 @@
+import uuid
 from datetime import datetime, timedelta, timezone
-from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi import APIRouter, Request, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import case
 from sqlalchemy.future import select
-from passlib.context import CryptContext
 from middleware.limiter import limiter
-from utils.jwt import create_refresh_token_payload, create_jwt_token
-from utils.db import get_session
+from utils.hashing import hasher
+from utils.jwt import create_refresh_token_payload, create_jwt_token, create_access_token
+from utils.db import get_session, insert
+from utils.config import config
+from utils.db.invites import redeem
+from utils.db.usernames import usernames
 from utils.db.schemas import User, UserRefreshToken
-from models.auth import userLogin, userRegister
-
-pwd_context = CryptContext(schemes=["pbkdf2_sha512"], deprecated="auto")
+from models.auth import userLogin, userRegister, loginResponse, registerResponse, usernameAvailability
 
 auth = APIRouter(
     prefix="/auth",
     tags=["Authentication"],
 )
 
-@auth.post("/login")
+@auth.post("/login", response_model=loginResponse)
 @limiter.limit("5/minute")
 async def login(request: Request, data: userLogin, db: AsyncSession = Depends(get_session)):
     """
@@ -29,72 +32,68 @@ async def login(request: Request, data: userLogin, db: AsyncSession = Depends(ge
         password: 8-128 characters, allows letters, numbers, and common special characters.
         device_id: Unique identifier for the user's device, such as Android Device ID (16), ios UUID(40).
     Returns:
-        A JSON object containing a success message, user UUID, and refresh token.
+        A JSON object containing a success message, user UUID, refresh token and a short-lived access token.
     """
 
     result = await db.execute(
-        select(User).where(
+        select(User.uuid, User.password).where(
             User.username == data.username
             )
         )
-    user = result.scalar_one_or_none()
+    user = result.one_or_none()
     
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    if data.password == user.password:
-        result = await db.execute(
-            select(UserRefreshToken).where(
-                UserRefreshToken.user_uuid == user.uuid,
-                UserRefreshToken.device_id == data.device_id
-            )
-        )
-        existing_token = result.scalar_one_or_none()
-        
-        if existing_token and existing_token.expires_at > datetime.now(timezone.utc):
-            return {
-                "message": "Login successful",
-                "user_uuid": user.uuid,
-                "refresh_token": existing_token.token,
-                "device_id": existing_token.device_id,
-                "created_at": existing_token.created_at.isoformat(),
-                "expires_at": existing_token.expires_at.isoformat()
-            }
-        elif existing_token:
-            try:
-                await db.delete(existing_token)
-                await db.commit()
-            except Exception as e:
-                await db.rollback()
-                raise HTTPException(status_code=400, detail=f"Error on deleting expired access token: {str(e)}")
-
+    if await hasher.verify(data.password, user.password):
+        # One round trip for the per-device refresh token: insert it, or keep the existing
+        # one while it is still valid and replace it once it has expired.
+        now = datetime.now(timezone.utc)
         token = create_jwt_token(create_refresh_token_payload(user.uuid, data.device_id))
-        new_access_token = UserRefreshToken(
+        stmt = insert(UserRefreshToken).values(
+            token_uuid=str(uuid.uuid4()),
             user_uuid=user.uuid,
             token=token,
             device_id=data.device_id,
-            expires_at=datetime.now(timezone.utc) + timedelta(days=7)
+            created_at=now,
+            expires_at=now + timedelta(days=7)
+        )
+        still_valid = UserRefreshToken.expires_at > now
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserRefreshToken.user_uuid, UserRefreshToken.device_id],
+            set_={
+                column: case((still_valid, getattr(UserRefreshToken, column)), else_=getattr(stmt.excluded, column))
+                for column in ("token_uuid", "token", "created_at", "expires_at")
+            }
+        ).returning(
+            UserRefreshToken.token_uuid,
+            UserRefreshToken.token,
+            UserRefreshToken.created_at,
+            UserRefreshToken.expires_at
         )
-        db.add(new_access_token)
         try:
+            result = await db.execute(stmt)
+            refresh_token = result.one()
             await db.commit()
-            await db.refresh(new_access_token)
         except Exception as e:
             await db.rollback()
-            raise HTTPException(status_code=400, detail=f"Error on creating access token: {str(e)}")
+            raise HTTPException(status_code=400, detail=f"Error on creating refresh token: {str(e)}")
         
-        return {
-            "message": "Login successful",
-            "user_uuid": user.uuid,
-            "refresh_token": token,
-            "device_id": new_access_token.device_id,
-            "created_at": new_access_token.created_at.isoformat(),
-            "expires_at": new_access_token.expires_at.isoformat()
-        }
+        access_token, access_token_expires_at = create_access_token(user.uuid, refresh_token.token_uuid, data.device_id)
+        return loginResponse(
+            message="Login successful",
+            user_uuid=user.uuid,
+            refresh_token=refresh_token.token,
+            access_token=access_token,
+            access_token_expires_at=access_token_expires_at,
+            device_id=data.device_id,
+            created_at=refresh_token.created_at,
+            expires_at=refresh_token.expires_at
+        )
     else:
         raise HTTPException(status_code=401, detail="Invalid Username or Password")
 
-@auth.post("/register")
+@auth.post("/register", response_model=registerResponse)
 @limiter.limit("3/minute")
 async def register(request: Request, data: userRegister, db: AsyncSession = Depends(get_session)):
     """
@@ -106,10 +105,15 @@ async def register(request: Request, data: userRegister, db: AsyncSession = Depe
         username: 8-32 characters, allows only letters, numbers, and underscores.
         password: 8-128 characters, allows letters, numbers, and common special characters.
         display_name: 1-32 characters.
-        invite_code: Optional invite code for registration.
+        invite_code: Invite code for registration, optional unless INVITE_REQUIRED is set.
     Returns: 
         A JSON object containing a success message.
+    Raises:
+        HTTPException: 409 if the username exists, 403 if the invite code is missing, invalid, used up or expired.
     """
+    if config.invite_required and not data.invite_code:
+        raise HTTPException(status_code=403, detail="An invite code is required")
+
     result = await db.execute(
         select(User).where(
             User.username == data.username
@@ -122,15 +126,39 @@ async def register(request: Request, data: userRegister, db: AsyncSession = Depe
     
     new_user = User(
         username=data.username,
-        password=data.password,
+        password=await hasher.hash(data.password),
         display_name=data.display_name
     )
     db.add(new_user)
     try:
-        await db.commit()
-        await db.refresh(new_user)
+        await db.flush()
+        # Redeemed last, the invite code row is only locked for the commit round trip,
+        # and a failed insert never consumes a use.
+        redeemed = not data.invite_code or await redeem(db, data.invite_code)
+        if redeemed:
+            await db.commit()
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=400, detail=f"Registration failed: {str(e)}")
+    if not redeemed:
+        await db.rollback()
+        raise HTTPException(status_code=403, detail="Invalid or expired invite code")
     
-    return {"message": "Registration successful", "uuid": new_user.uuid}
\ No newline at end of file
+    usernames.add(data.username)
+    return registerResponse(message="Registration successful", uuid=new_user.uuid)
+
+@auth.get("/username-available", response_model=usernameAvailability)
+@limiter.limit("60/minute")
+async def username_available(request: Request, username: str = Query(min_length=8, max_length=32, pattern=r"^[a-zA-Z0-9_]+$")):
+    """
+    Endpoint to check whether a username is still free, e.g. while it is typed.
+    Usernames certainly not taken are answered from an in-memory filter without a database query,
+    see `utils.db.usernames.UsernameIndex`. The answer is advisory, registration can still return 409.
+    Limits:
+        - 60 requests per minute.
+    Parameters:
+        username: 8-32 characters, allows only letters, numbers, and underscores.
+    Returns:
+        A JSON object with the username and whether it is available.
+    """
+    return usernameAvailability(username=username, available=not await usernames.is_taken(username))
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import time
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from utils.config import config
+from utils.log import logger
+from utils.jwt import verify_access_token, revoked_tokens
+from utils.pubsub import broker, user_topic, Subscription
+from utils.db.presence import presence
+
+events = APIRouter(
+    prefix="/events",
+    tags=["Events"],
+)
+
+# Close codes, 4000-4999 are reserved for applications.
+CLOSE_POLICY_VIOLATION = 1008
+CLOSE_TRY_AGAIN_LATER = 1013
+CLOSE_TOKEN_EXPIRED = 4001
+
+def _bearer_token(websocket: WebSocket) -> str | None:
+    authorization = websocket.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        return authorization[7:]
+    return websocket.query_params.get("token")
+
+async def _send(websocket: WebSocket, subscription: Subscription):
+    while (data := await subscription.get()) is not None:
+        await websocket.send_text(data)
+    await websocket.close(code=CLOSE_TRY_AGAIN_LATER, reason="Too slow, reconnect")
+
+async def _receive(websocket: WebSocket, subscription: Subscription, user_uuid: str):
+    own_topic = user_topic(user_uuid)
+    while True:
+        try:
+            message = json.loads(await websocket.receive_text())
+            presence.touch(user_uuid)
+            op = message["op"]
+            topics = {user_topic(str(uuid)) for uuid in message.get("uuids", [])} - {own_topic}
+        except (ValueError, KeyError, TypeError):
+            await websocket.send_json({"error": "Invalid message"})
+            continue
+
+        if op == "watch":
+            if len(subscription.topics | topics) > config.ws_max_watched + 1:
+                await websocket.send_json({"error": f"At most {config.ws_max_watched} users can be watched"})
+                continue
+            subscription.subscribe(*topics)
+        elif op == "unwatch":
+            subscription.unsubscribe(*topics)
+        elif op == "ping":
+            await websocket.send_json({"op": "pong"})
+            continue
+        else:
+            await websocket.send_json({"error": f"Unknown op {op}"})
+            continue
+        await websocket.send_json({"op": op, "watching": len(subscription.topics) - 1})
+
+async def _expire(websocket: WebSocket, payload: dict):
+    # Access tokens are short-lived, the client reconnects with a fresh one. Revocations on
+    # this worker are picked up within `ws_revocation_check` seconds.
+    while (remaining := payload["exp"] - time.time()) > 0:
+        await asyncio.sleep(min(remaining, config.ws_revocation_check))
+        if payload.get("refresh_token_uuid") in revoked_tokens:
+            break
+    await websocket.close(code=CLOSE_TOKEN_EXPIRED, reason="Token expired or revoked")
+
+@events.websocket("/ws")
+async def event_stream(websocket: WebSocket):
+    """
+    WebSocket endpoint pushing changes instead of polling.
+    Authentication is required, with the access token in an `Authorization: Bearer` header or the `token` query parameter.
+    Own events are delivered automatically, other users are watched with
+    `{"op": "watch", "uuids": [...]}` and `{"op": "unwatch", "uuids": [...]}`.
+    Any client message, e.g. `{"op": "ping"}`, keeps the user online in `presence`.
+    Events:
+        {"topic": "user:<uuid>", "type": "presence", "uuid": ..., "online": true/false}
+        {"topic": "user:<uuid>", "type": "profile", "uuid": ..., "display_name": ...}
+    Limits:
+        - WS_MAX_WATCHED watched users per connection.
+        - WS_SEND_QUEUE_SIZE pending events, a connection that falls further behind is closed with 1013.
+    """
+    payload = verify_access_token(_bearer_token(websocket) or "")
+    if payload is None:
+        await websocket.close(code=CLOSE_POLICY_VIOLATION, reason="Invalid or expired token.")
+        return
+
+    await websocket.accept()
+    presence.touch(payload["user_uuid"])
+    subscription = broker.subscription()
+    subscription.subscribe(user_topic(payload["user_uuid"]))
+    tasks = [
+        asyncio.create_task(_send(websocket, subscription)),
+        asyncio.create_task(_receive(websocket, subscription, payload["user_uuid"])),
+        asyncio.create_task(_expire(websocket, payload)),
+    ]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        subscription.close()
+        for task in tasks:
+            task.cancel()
+        await asyncio.wait(tasks)
+        for task in tasks:
+            # Disconnects surface as WebSocketDisconnect, or RuntimeError when sending on a closed socket.
+            error = None if task.cancelled() else task.exception()
+            if error is not None and not isinstance(error, (WebSocketDisconnect, RuntimeError)):
+                logger.error(f"Event stream failed: {error!r}")
@@ -1,19 +1,20 @@
 from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, Request, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import update
 from sqlalchemy.future import select
 from middleware.limiter import limiter
 from utils.db import get_session
 from utils.db.schemas import UserRefreshToken
-from utils.jwt import create_jwt_token, decode_jwt_token
-from models.token import RevokeRefreshToken, RefreshToken, RefreshType
+from utils.jwt import create_jwt_token, decode_jwt_token, create_refresh_token_payload, create_access_token, revoked_tokens
+from models.token import RevokeRefreshToken, RefreshToken, RefreshType, RevokeResponse, AccessTokenResponse, RotatedTokenResponse
 
 token = APIRouter(
     prefix="/token",
     tags=["Token Management"],
 )
 
-@token.post("/revoke")
+@token.post("/revoke", response_model=RevokeResponse)
 @limiter.limit("5/minute")
 async def cancel_accesstoken(request: Request, data: RevokeRefreshToken, db: AsyncSession = Depends(get_session)):
     """
@@ -41,13 +42,14 @@ async def cancel_accesstoken(request: Request, data: RevokeRefreshToken, db: Asy
     try:
         await db.delete(token_record)
         await db.commit()
+        revoked_tokens.add(token_record.token_uuid)
 
-        return {"message": "Refresh token cancelled successfully"}
+        return RevokeResponse(message="Refresh token cancelled successfully")
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=400, detail=f"Error cancelling refresh token: {str(e)}")
 
-@token.post("/refresh")
+@token.post("/refresh", response_model=AccessTokenResponse | RotatedTokenResponse)
 @limiter.limit("5/minute")
 async def refresh_token(request: Request, data: RefreshToken, db: AsyncSession = Depends(get_session)):
     """
@@ -56,14 +58,73 @@ async def refresh_token(request: Request, data: RefreshToken, db: AsyncSession =
         - 5 requests per minute.
     Parameters:
         type: application/json
-        access_token: The access token to be refreshed.
         refresh_token: The refresh token to be used.
         device_id: The device ID associated with the token.
+        type: "access_token" to get a new access token, "refresh_token" to rotate the refresh token as well.
     Returns:
-        A JSON object containing a new access token if the refresh is successful.
+        A JSON object containing a new access token, and the new refresh token when it was rotated.
     """
+    try:
+        user_uuid = decode_jwt_token(data.refresh_token)["user_uuid"]
+    except (ValueError, KeyError):
+        raise HTTPException(status_code=401, detail="Refresh token is invalid or expired. Please login again")
+
+    now = datetime.now(timezone.utc)
     if data.type == RefreshType.ACCESS_TOKEN:
-        pass
-    elif data.type == RefreshType.REFRESH_TOKEN:
-        pass
-    
\ No newline at end of file
+        result = await db.execute(
+            select(UserRefreshToken.token_uuid).where(
+                UserRefreshToken.token == data.refresh_token,
+                UserRefreshToken.user_uuid == user_uuid,
+                UserRefreshToken.device_id == data.device_id,
+                UserRefreshToken.expires_at > now
+            )
+        )
+        token_uuid = result.scalar_one_or_none()
+        if not token_uuid:
+            raise HTTPException(status_code=401, detail="Refresh token is invalid or expired. Please login again")
+
+        access_token, access_token_expires_at = create_access_token(user_uuid, token_uuid, data.device_id)
+        return AccessTokenResponse(
+            message="Access token refreshed successfully",
+            access_token=access_token,
+            access_token_expires_at=access_token_expires_at
+        )
+    
+    # Rotation is a single conditional UPDATE, so two concurrent refreshes of the same
+    # token cannot both succeed and no read-modify-write round trip is needed.
+    new_token = create_jwt_token(create_refresh_token_payload(user_uuid, data.device_id))
+    try:
+        result = await db.execute(
+            update(UserRefreshToken)
+            .where(
+                UserRefreshToken.token == data.refresh_token,
+                UserRefreshToken.user_uuid == user_uuid,
+                UserRefreshToken.device_id == data.device_id,
+                UserRefreshToken.expires_at > now
+            )
+            .values(
+                token=new_token,
+                created_at=now,
+                expires_at=now + timedelta(days=7)
+            )
+            .returning(UserRefreshToken.token_uuid, UserRefreshToken.created_at, UserRefreshToken.expires_at)
+        )
+        rotated = result.one_or_none()
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=f"Error on rotating refresh token: {str(e)}")
+
+    if not rotated:
+        raise HTTPException(status_code=401, detail="Refresh token is invalid or expired. Please login again")
+
+    access_token, access_token_expires_at = create_access_token(user_uuid, rotated.token_uuid, data.device_id)
+    return RotatedTokenResponse(
+        message="Refresh token rotated successfully",
+        refresh_token=new_token,
+        device_id=data.device_id,
+        created_at=rotated.created_at,
+        expires_at=rotated.expires_at,
+        access_token=access_token,
+        access_token_expires_at=access_token_expires_at
+    )
@@ -1,24 +1,59 @@
-from fastapi import APIRouter, Request, HTTPException
-from fastapi import Depends
+from fastapi import APIRouter, Request, Response, HTTPException
+from fastapi import Depends, Query
+from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import update
 from sqlalchemy.future import select
 from middleware.limiter import limiter
-from utils.db import get_session
+from utils.admission import admission
+from utils.avatars import avatars, MEDIA_TYPES
+from utils.db import get_session, matches_any, AsyncSessionLocal
+from utils.db.replicas import replicas
 from utils.db.schemas import User
 from utils.jwt import get_user_uuid
-from models.user import updateProfile, updatePassword
+from utils.hashing import hasher
+from utils.cache import profile_cache
+from utils.etag import make_etag, check_etag, if_none_match
+from utils.pubsub import broker, user_topic
+from models.user import updateProfile, updatePassword, userProfile, cachedProfile, updateProfileResponse, messageResponse, avatarResponse, batchUsers, batchUsersResponse, publicProfile
  
 user = APIRouter(
     prefix="/user",
     tags=["User"],
 )
 
-@user.get("/me")
+PROFILE_COLUMNS = (
+    User.uuid,
+    User.username,
+    User.display_name,
+    User.avatar_url,
+    User.is_online,
+    User.last_online_at,
+    User.registered_at,
+    User.profile_version,
+)
+
+async def load_profile(user_uuid: str) -> cachedProfile | None:
+    result = await replicas.execute(
+        select(*PROFILE_COLUMNS).where(User.uuid == user_uuid)
+    )
+    row = result.one_or_none()
+    if not row:
+        return None
+
+    return cachedProfile.model_validate(row._mapping)
+
+@user.get("/me", response_model=userProfile)
 @limiter.limit("10/minute")
-async def get_user(request: Request, user_uuid: str = Depends(get_user_uuid), db: AsyncSession = Depends(get_session)):
+async def get_user(request: Request, response: Response, user_uuid: str = Depends(get_user_uuid)):
     """
     Endpoint to get User profile.
     Authentication is required, user UUID is obtained from JWT token in header.
+    Profiles are served from `profile_cache`, concurrent misses for the same user share one query.
+    The response carries an ETag derived from the cached profile version and the presence fields,
+    which `presence` updates without bumping the version. A matching `If-None-Match` is answered with
+    304 without a query when the profile is cached; on a miss the profile is loaded (and cached) first,
+    so the 304 only saves the response body.
     Limits:
         - 10 requests per minute.
     Parameters:
@@ -26,24 +61,55 @@ async def get_user(request: Request, user_uuid: str = Depends(get_user_uuid), db
     Returns:
         A JSON object containing user information such as username, display name, UUID, avatar URL,
     """
-    result = await db.execute(
-        select(User).where(User.uuid == user_uuid)
-    )
-    db_user = result.scalar_one_or_none()
-    if not db_user:
+    profile = await profile_cache.get(user_uuid, load_profile)
+    if not profile:
         raise HTTPException(status_code=404, detail="User not found")
- 
-    return {
-        "uuid": db_user.uuid,
-        "username": db_user.username,
-        "display_name": db_user.display_name,
-        "avatar_url": db_user.avatar_url,
-        "is_online": db_user.is_online,
-        "last_online_at": db_user.last_online_at.isoformat(),
-        "registered_at": db_user.registered_at.isoformat(),
-    }
 
-@user.post("/update/profile")
+    etag = make_etag("user", user_uuid, profile.profile_version, profile.is_online, profile.last_online_at.isoformat())
+    if (not_modified := check_etag(request, response, etag)) is not None:
+        return not_modified
+
+    return profile
+
+@user.post("/batch", response_model=batchUsersResponse)
+@limiter.limit("30/minute")
+async def get_users(request: Request, data: batchUsers, user_uuid: str = Depends(get_user_uuid)):
+    """
+    Endpoint to resolve several users' public profiles at once, e.g. to render observer lists.
+    Authentication is required.
+    Profiles already in `profile_cache` are served from it, the rest are loaded from a read replica
+    with one query and cached.
+    Limits:
+        - 30 requests per minute.
+    Parameters:
+        uuids: 1-200 user UUIDs.
+    Returns:
+        A JSON object with `users`, keyed by UUID, holding username, display name and avatar URL,
+        and `missing`, the requested UUIDs that do not exist.
+    """
+    uuids = list(dict.fromkeys(data.uuids))
+    profiles = {}
+    for uuid in uuids:
+        if (profile := profile_cache.peek(uuid)) is not None:
+            profiles[uuid] = profile
+
+    gaps = [uuid for uuid in uuids if uuid not in profiles]
+    if gaps:
+        since = profile_cache.invalidations
+        result = await replicas.execute(select(*PROFILE_COLUMNS).where(matches_any(User.uuid, gaps)))
+        for row in result:
+            profile = profiles[row.uuid] = cachedProfile.model_validate(row._mapping)
+            profile_cache.put(row.uuid, profile, since)
+
+    return batchUsersResponse(
+        users={
+            uuid: publicProfile(username=p.username, display_name=p.display_name, avatar_url=p.avatar_url)
+            for uuid in uuids if (p := profiles.get(uuid)) is not None
+        },
+        missing=[uuid for uuid in uuids if uuid not in profiles],
+    )
+
+@user.post("/update/profile", response_model=updateProfileResponse | None)
 @limiter.limit("8/minute")
 async def update_user_profile(request: Request, data: updateProfile, user_uuid: str = Depends(get_user_uuid), db: AsyncSession = Depends(get_session)):
     """
@@ -65,11 +131,14 @@ async def update_user_profile(request: Request, data: updateProfile, user_uuid:
     
     if data.display_name:
         user.display_name = data.display_name
+        user.profile_version = User.profile_version + 1
         await db.commit()
-        return {"message": "Display name updated successfully", "display_name": user.display_name}
+        await profile_cache.invalidate(user_uuid)
+        broker.publish(user_topic(user_uuid), {"type": "profile", "uuid": user_uuid, "display_name": data.display_name})
+        return updateProfileResponse(message="Display name updated successfully", display_name=data.display_name)
     
         
-@user.post("/update/password")
+@user.post("/update/password", response_model=messageResponse)
 @limiter.limit("3/minute")
 async def update_user_password(request: Request, data: updatePassword, user_uuid: str = Depends(get_user_uuid), db: AsyncSession = Depends(get_session)):
     """
@@ -91,13 +160,81 @@ async def update_user_password(request: Request, data: updatePassword, user_uuid
         raise HTTPException(status_code=404, detail="User not found")
     
     if data.old_password and data.new_password and data.old_password.strip() and data.new_password.strip():
-        if user.password != data.old_password:            
+        if not await hasher.verify(data.old_password, user.password):
             raise HTTPException(status_code=400, detail="Old password is incorrect")
         
-        user.password = data.new_password
+        user.password = await hasher.hash(data.new_password)
         await db.commit()
-        return {"message": "Password updated successfully"}
+        await profile_cache.invalidate(user_uuid)
+        return messageResponse(message="Password updated successfully")
     
     raise HTTPException(status_code=400, detail="Invalid request data")
 
+@user.post(
+    "/avatar",
+    response_model=avatarResponse,
+    openapi_extra={"requestBody": {"required": True, "content": {"image/*": {"schema": {"type": "string", "format": "binary"}}}}},
+)
+@limiter.limit("5/minute")
+async def upload_avatar(request: Request, user_uuid: str = Depends(get_user_uuid)):
+    """
+    Endpoint to set the User avatar.
+    Authentication is required, user UUID is obtained from JWT token in header.
+    The raw image is sent as the request body. It is streamed to disk, stored once per distinct content
+    and resized off the event loop, see `utils.avatars.AvatarStore`. No database connection is held
+    while the upload is received.
+    Limits:
+        - 5 requests per minute.
+        - AVATAR_MAX_BYTES bytes, PNG, JPEG, GIF or WebP.
+    Parameters:
+        The image bytes as the request body.
+    Returns:
+        A JSON object containing a success message and the new avatar URL, which also accepts a `size` query parameter.
+    Raises:
+        HTTPException: 413 if the image is too large, 415 if the format is not supported, 400 if it cannot be decoded.
+    """
+    name = await avatars.save(request)
+    avatar_url = f"/user/avatar/{name}"
 
+    async with admission.slot():
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(User)
+                .where(User.uuid == user_uuid)
+                .values(avatar_url=avatar_url, profile_version=User.profile_version + 1)
+            )
+            if result.rowcount == 0:
+                raise HTTPException(status_code=404, detail="User not found")
+            await db.commit()
+    await profile_cache.invalidate(user_uuid)
+    broker.publish(user_topic(user_uuid), {"type": "profile", "uuid": user_uuid, "avatar_url": avatar_url})
+    return avatarResponse(message="Avatar updated successfully", avatar_url=avatar_url)
+
+@user.get("/avatar/{name}", response_class=FileResponse)
+async def get_avatar(request: Request, name: str, size: int | None = Query(None, ge=1, le=4096)):
+    """
+    Endpoint to serve avatars, no authentication required.
+    Avatars are content addressed, so responses carry a strong ETag and may be cached forever.
+    `Range` requests are supported, the file is sent with `sendfile` when the server supports
+    the ASGI path send extension and streamed in chunks from a thread otherwise.
+    Parameters:
+        name: The avatar name from `avatar_url`.
+        size: Optional, the displayed size in pixels, the smallest stored variant at least this large is served.
+    Returns:
+        The image.
+    Raises:
+        HTTPException: If the avatar does not exist.
+    """
+    found = await avatars.find(name, size)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Avatar not found")
+    path, stat_result, variant = found
+
+    digest, ext = name.split(".")
+    headers = {
+        "ETag": f'"{digest}-{variant or "original"}"',
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if if_none_match(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, headers=headers, media_type=MEDIA_TYPES[ext], stat_result=stat_result)
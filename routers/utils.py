@@ -1,12 +1,13 @@
 from fastapi import APIRouter, Request
 from middleware.limiter import limiter
+from models.utils import hostnameResponse
 
 utils = APIRouter(
     prefix="/utils",
     tags=["Utils"],
 )
 
-@utils.get("/getHostname")
+@utils.get("/getHostname", response_model=hostnameResponse)
 @limiter.limit("30/minute")
 async def get_hostname(request: Request):
     """
@@ -17,4 +18,4 @@ async def get_hostname(request: Request):
         A JSON object containing the hostname.
     """
     hostname = request.headers.get("host")
-    return {"hostname": hostname}
\ No newline at end of file
+    return hostnameResponse(hostname=hostname)
\ No newline at end of file
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Request, Response
+from utils.config import config
+from utils.etag import if_none_match
+from utils.jwks import keyring
+
+wellknown = APIRouter(
+    prefix="/.well-known",
+    tags=["Keys"],
+)
+
+@wellknown.get("/jwks.json")
+async def get_jwks(request: Request):
+    """
+    Endpoint publishing the public JWT signing keys (RFC 7517), so other services can verify tokens locally.
+    Tokens name their key with the `kid` header, a verifier seeing an unknown `kid` should refetch the document.
+    The document is prebuilt and served with a long `Cache-Control` (JWKS_MAX_AGE), new keys are published
+    for that long before they sign.
+    Returns:
+        A JSON object with the `keys` list, empty when tokens are signed with SECRET_KEY.
+    """
+    document, etag = keyring.document()
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={config.jwks_max_age}"}
+    if if_none_match(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=document, media_type="application/json", headers=headers)
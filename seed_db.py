@@ -0,0 +1,229 @@
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone, timedelta
+from sqlalchemy_utils.types.password import Password
+from utils.db import engine, insert, DATABASE_BACKEND
+from utils.db.schemas import User, UserRefreshToken
+from utils.hashing import pwd_context
+from utils.jwt import create_refresh_token_payload, create_jwt_token
+
+# For staging and benchmarks, this script bulk loads users and their refresh tokens.
+# Input rows have `username`, `password` (or an existing `password_hash`) and optionally
+# `display_name`, `uuid` and `avatar_url`.
+# It should not be used in production environments.
+
+USER_COLUMNS = (
+    "uuid", "avatar_url", "username", "display_name", "password",
+    "is_online", "last_online_at", "registered_at", "profile_version",
+)
+TOKEN_COLUMNS = ("token_uuid", "user_uuid", "token", "device_id", "created_at", "expires_at")
+
+_handlers = {}
+
+def _hash(secret: str, rounds: int | None) -> bytes:
+    if rounds is None:
+        return pwd_context.hash(secret).encode("utf8")
+    if rounds not in _handlers:
+        _handlers[rounds] = pwd_context.handler().using(rounds=rounds)
+    return _handlers[rounds].hash(secret).encode("utf8")
+
+def _build_chunk(rows: list[dict], devices: int, rounds: int | None) -> tuple[list[tuple], list[tuple]]:
+    """
+    Runs in a worker process: hashes the chunk's passwords and signs its refresh tokens.
+    """
+    now = datetime.now(timezone.utc)
+    users, tokens = [], []
+    for row in rows:
+        user_uuid = row.get("uuid") or str(uuid.uuid4())
+        hashed = row["password_hash"].encode("utf8") if row.get("password_hash") else _hash(row["password"], rounds)
+        users.append((
+            user_uuid, row.get("avatar_url") or "default_avatar.png", row["username"],
+            row.get("display_name") or row["username"], hashed, False, now, now, 1,
+        ))
+        for device in range(devices):
+            device_id = f"seed-device-{device}"
+            token = create_jwt_token(create_refresh_token_payload(user_uuid, device_id))
+            tokens.append((str(uuid.uuid4()), user_uuid, token, device_id, now, now + timedelta(days=7)))
+    return users, tokens
+
+def read_rows(path: str):
+    """
+    Streams rows from a CSV file with a header line, or from JSON lines (`.jsonl`/`.ndjson`), `-` reads stdin.
+    """
+    file = sys.stdin if path == "-" else open(path, newline="", encoding="utf8")
+    with file:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(file)
+
+def generate_rows(count: int, password: str, prefix: str):
+    for n in range(count):
+        yield {"username": f"{prefix}{n:07d}", "display_name": f"Seed User {n}", "password": password}
+
+def valid(row: dict) -> bool:
+    username = row.get("username")
+    return (
+        bool(username) and len(username) <= 32
+        and len(row.get("display_name") or username) <= 32
+        and bool(row.get("password") or row.get("password_hash"))
+    )
+
+class CopyLoader:
+    """
+    Loads chunks with asyncpg `COPY`, one transaction per chunk. With `skip_existing` the rows are
+    copied into temporary tables first and moved with `INSERT ... ON CONFLICT DO NOTHING`,
+    tokens of skipped users are dropped.
+    """
+    def __init__(self, skip_existing: bool):
+        self.skip_existing = skip_existing
+
+    async def __aenter__(self):
+        self.conn = await engine.connect()
+        self.raw = (await self.conn.get_raw_connection()).driver_connection
+        if self.skip_existing:
+            await self.raw.execute(
+                "CREATE TEMPORARY TABLE seed_users (LIKE users INCLUDING DEFAULTS);"
+                "CREATE TEMPORARY TABLE seed_tokens (LIKE user_tokens INCLUDING DEFAULTS);"
+            )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.conn.close()
+
+    async def load(self, users: list[tuple], tokens: list[tuple]) -> tuple[int, int]:
+        async with self.raw.transaction():
+            if not self.skip_existing:
+                await self.raw.copy_records_to_table("users", records=users, columns=USER_COLUMNS)
+                if tokens:
+                    await self.raw.copy_records_to_table("user_tokens", records=tokens, columns=TOKEN_COLUMNS)
+                return len(users), len(tokens)
+
+            await self.raw.copy_records_to_table("seed_users", records=users, columns=USER_COLUMNS)
+            await self.raw.copy_records_to_table("seed_tokens", records=tokens, columns=TOKEN_COLUMNS)
+            user_columns, token_columns = ", ".join(USER_COLUMNS), ", ".join(TOKEN_COLUMNS)
+            # Status is "INSERT 0 <rows>".
+            inserted_users = await self.raw.execute(
+                f"INSERT INTO users ({user_columns}) SELECT {user_columns} FROM seed_users ON CONFLICT DO NOTHING"
+            )
+            inserted_tokens = await self.raw.execute(
+                f"INSERT INTO user_tokens ({token_columns}) "
+                f"SELECT {', '.join('t.' + column for column in TOKEN_COLUMNS)} FROM seed_tokens t "
+                f"JOIN seed_users s ON s.uuid = t.user_uuid JOIN users u ON u.uuid = s.uuid AND u.username = s.username "
+                f"ON CONFLICT DO NOTHING"
+            )
+            await self.raw.execute("TRUNCATE seed_users, seed_tokens")
+        return int(inserted_users.split()[-1]), int(inserted_tokens.split()[-1])
+
+    async def finish(self):
+        # Fresh planner statistics, so benchmarks do not run against an empty-table plan.
+        await self.raw.execute("ANALYZE users")
+        await self.raw.execute("ANALYZE user_tokens")
+
+class InsertLoader:
+    """
+    Fallback for databases without `COPY` (SQLite): one multi-row INSERT per chunk.
+    """
+    def __init__(self, skip_existing: bool):
+        self.skip_existing = skip_existing
+
+    async def __aenter__(self):
+        self.conn = await engine.connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.conn.close()
+
+    async def load(self, users: list[tuple], tokens: list[tuple]) -> tuple[int, int]:
+        stmt = insert(User.__table__)
+        if self.skip_existing:
+            stmt = stmt.on_conflict_do_nothing()
+        result = await self.conn.execute(
+            stmt.returning(User.uuid),
+            [dict(zip(USER_COLUMNS, row), password=Password(row[4])) for row in users],
+        )
+        inserted = set(result.scalars().all())
+        tokens = [row for row in tokens if row[1] in inserted]
+        if tokens:
+            await self.conn.execute(
+                insert(UserRefreshToken.__table__).on_conflict_do_nothing(),
+                [dict(zip(TOKEN_COLUMNS, row)) for row in tokens],
+            )
+        await self.conn.commit()
+        return len(inserted), len(tokens)
+
+    async def finish(self):
+        pass
+
+async def seed(rows, chunk_size: int, workers: int, devices: int, rounds: int | None, skip_existing: bool):
+    loader_class = CopyLoader if DATABASE_BACKEND == "postgresql" else InsertLoader
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    users = tokens = rejected = 0
+
+    def report(end="\r"):
+        elapsed = time.perf_counter() - start
+        print(
+            f"{users:,} users, {tokens:,} tokens, {rejected:,} rejected, "
+            f"{(users + tokens) / elapsed:,.0f} rows/s", end=end, flush=True,
+        )
+
+    async with loader_class(skip_existing) as loader:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # At most two chunks per worker in flight, memory stays constant whatever the input size.
+            pending = deque()
+
+            async def load_next():
+                nonlocal users, tokens
+                loaded_users, loaded_tokens = await loader.load(*await pending.popleft())
+                users += loaded_users
+                tokens += loaded_tokens
+                report()
+
+            while chunk := list(itertools.islice(rows, chunk_size)):
+                accepted = [row for row in chunk if valid(row)]
+                rejected += len(chunk) - len(accepted)
+                if accepted:
+                    pending.append(loop.run_in_executor(pool, _build_chunk, accepted, devices, rounds))
+                if len(pending) >= workers * 2:
+                    await load_next()
+            while pending:
+                await load_next()
+        await loader.finish()
+    report(end="\n")
+    await engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load users and refresh tokens for staging and benchmarks.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("path", nargs="?", help="CSV with a header line or JSON lines (.jsonl), - for stdin.")
+    source.add_argument("--generate", type=int, metavar="N", help="Generate N users instead of reading a file.")
+    parser.add_argument("--password", default="Seed-password-1", help="Password of generated users.")
+    parser.add_argument("--prefix", default="seed", help="Username prefix of generated users.")
+    parser.add_argument("--devices", type=int, default=0, help="Refresh tokens (devices) per user.")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="Rows per COPY / hashing job.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Hashing processes.")
+    parser.add_argument("--rounds", type=int, help="PBKDF2 rounds, lower than the default for faster staging seeds.")
+    parser.add_argument("--skip-existing", action="store_true", help="Skip users whose username or UUID already exists.")
+    args = parser.parse_args()
+    if args.generate is not None and args.generate < 1:
+        parser.error("--generate must be at least 1")
+    for name in ("workers", "chunk_size", "rounds"):
+        if (value := getattr(args, name)) is not None and value < 1:
+            parser.error(f"--{name.replace('_', '-')} must be at least 1")
+    if args.devices < 0:
+        parser.error("--devices must not be negative")
+
+    rows = generate_rows(args.generate, args.password, args.prefix) if args.generate is not None else read_rows(args.path)
+    asyncio.run(seed(iter(rows), args.chunk_size, args.workers, args.devices, args.rounds, args.skip_existing))
@@ -0,0 +1,137 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+from utils.config import config
+from utils.metrics import registry, current_scope, route_label, GaugeCollector
+
+def _overloaded() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy, please try again later",
+        headers={"Retry-After": str(config.admission_retry_after)},
+    )
+
+class AdmissionGate:
+    """
+    FIFO concurrency limit with a bounded wait queue.
+    Parameters:
+        limit: Maximum number of requests holding a slot at once.
+        max_queue: Maximum number of requests waiting for a slot, more are rejected right away.
+    Raises:
+        HTTPException: 503 with Retry-After when the queue is full or the wait outlasts the timeout.
+    """
+    def __init__(self, limit: int, max_queue: int):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.in_use = 0
+        self.waiters: deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    async def acquire(self, timeout: float):
+        if self.in_use < self.limit and not self.waiters:
+            self.in_use += 1
+            self.admitted += 1
+            return
+        if timeout <= 0 or len(self.waiters) >= self.max_queue:
+            self.rejected += 1
+            raise _overloaded()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            if not self._granted(waiter):
+                self.timeouts += 1
+                raise _overloaded()
+        except asyncio.CancelledError:
+            if self._granted(waiter):
+                self.release()
+            raise
+        self.admitted += 1
+
+    def _granted(self, waiter: asyncio.Future) -> bool:
+        # A slot can be handed over in the same loop iteration the wait ends in.
+        if waiter.done() and not waiter.cancelled():
+            return True
+        try:
+            self.waiters.remove(waiter)
+        except ValueError:
+            pass
+        return False
+
+    def release(self):
+        # Hand the slot straight to the oldest waiter, `in_use` stays the same.
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_use -= 1
+
+    def stats(self) -> dict:
+        return {
+            "in_use": self.in_use,
+            "limit": self.limit,
+            "waiting": len(self.waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+class Admission:
+    """
+    One `AdmissionGate` per route group, the first path segment of the matched route (`/auth/login` is `auth`).
+    Groups without a configured limit share the `default` gate. Each request gets a deadline
+    `deadline` seconds after it arrived (`arrived_at`, stamped by the outermost middleware), so time
+    spent before the first database access counts too, and waiting for a slot never outlasts it.
+    """
+    def __init__(self, limits: dict[str, int], default_limit: int, max_queue: int, deadline: float):
+        self.deadline = deadline
+        self.gates = {group: AdmissionGate(limit, max_queue) for group, limit in limits.items()}
+        self.gates.setdefault("default", AdmissionGate(default_limit, max_queue))
+
+    def gate(self, scope: dict) -> AdmissionGate:
+        group = route_label(scope).strip("/").split("/", 1)[0]
+        return self.gates.get(group) or self.gates["default"]
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Holds a slot of the current request's route group. Re-entrant within a request,
+        and a no-op outside of one (background tasks).
+        """
+        scope = current_scope.get()
+        if scope is None or scope.get("admission_gate") is not None:
+            yield
+            return
+
+        gate = self.gate(scope)
+        now = time.monotonic()
+        await gate.acquire(scope.get("arrived_at", now) + self.deadline - now)
+        scope["admission_gate"] = gate
+        try:
+            yield
+        finally:
+            scope["admission_gate"] = None
+            gate.release()
+
+    def stats(self) -> dict:
+        return {
+            f"{group}_{key}": value
+            for group, gate in self.gates.items()
+            for key, value in gate.stats().items()
+        }
+
+admission = Admission(
+    config.admission_limits,
+    default_limit=config.admission_default_limit,
+    max_queue=config.admission_queue_size,
+    deadline=config.request_deadline,
+)
+
+registry.register(GaugeCollector("astroeyes_admission", "Admission control state per route group.", admission.stats))
@@ -0,0 +1,233 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import re
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException, Request
+from utils.config import config
+from utils.log import logger
+from utils.metrics import registry, GaugeCollector
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+MEDIA_TYPES = {"png": "image/png", "jpg": "image/jpeg", "gif": "image/gif", "webp": "image/webp"}
+PIL_FORMATS = {"png": "PNG", "jpg": "JPEG", "gif": "GIF", "webp": "WEBP"}
+# Decoded size limit, a small file can still decompress into a huge image.
+MAX_PIXELS = 4096 * 4096
+NAME = re.compile(r"^([0-9a-f]{64})\.(png|jpg|gif|webp)$")
+
+def sniff(head: bytes) -> str | None:
+    """
+    Image format from the file's magic number, the client's Content-Type is not trusted.
+    """
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+def _make_variants(source: str, path: str, sizes: tuple[int, ...]):
+    # Runs in a worker process: decodes the upload at `source`, center-crops it to a square and writes
+    # one file per size next to the original's final `path`.
+    # Sizes at least as large as the original are skipped, the original is served for them.
+    base, ext = os.path.splitext(path)
+    Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+    with Image.open(source) as image:
+        # Pillow only raises above twice MAX_IMAGE_PIXELS, between 1x and 2x it merely warns.
+        if image.width * image.height > MAX_PIXELS:
+            raise ValueError(f"Image is {image.width}x{image.height}, larger than {MAX_PIXELS} pixels")
+        image.load()
+        side = min(image.size)
+        left, top = (image.width - side) // 2, (image.height - side) // 2
+        square = image.crop((left, top, left + side, top + side))
+        if ext == ".jpg" and square.mode not in ("RGB", "L"):
+            square = square.convert("RGB")
+        for size in sizes:
+            if size >= side:
+                continue
+            variant = square.resize((size, size), Image.Resampling.LANCZOS)
+            # Written under a temporary name so a concurrent reader never sees a partial file.
+            tmp = f"{base}-{size}.{uuid.uuid4().hex}.tmp"
+            variant.save(tmp, format=PIL_FORMATS[ext[1:]])
+            os.replace(tmp, f"{base}-{size}{ext}")
+
+class AvatarStore:
+    """
+    Content-addressed avatar storage on local disk.
+    Uploads are streamed to a temporary file chunk by chunk while being hashed, then moved to
+    `<root>/<sha256[:2]>/<sha256>.<ext>`; an upload identical to a stored file is dropped and the
+    stored one reused. Resized square variants (`<sha256>-<size>.<ext>`) are generated by Pillow in a
+    bounded process pool. Without Pillow only the original is kept and served for every size, and
+    uploads are not decoded at all: any body starting with an image magic number is stored and
+    served as that image type, install the `avatars` extra wherever uploads are accepted.
+    Files are shared by every user uploading the same image and are never deleted.
+    Parameters:
+        root: Storage directory.
+        max_bytes: Maximum upload size.
+        sizes: Variant sizes in pixels.
+        max_workers: Number of resizing processes.
+        max_pending: Maximum number of resize jobs queued or running at once.
+    Raises:
+        HTTPException: 413 for oversized uploads, 415 for unsupported formats, 400 for undecodable
+            images and 503 when the resize queue is full.
+    """
+    def __init__(self, root: str, max_bytes: int, sizes: list[int], max_workers: int = 1, max_pending: int = 8):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.sizes = tuple(sorted(sizes))
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.stored = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self._executor: ProcessPoolExecutor | None = None
+        if Image is None:
+            logger.warning("Pillow is not installed, avatar uploads are stored without validation or resized variants")
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Created inside a running, multi-threaded worker (event loop, log listener, profiler),
+            # forking it could deadlock the child on a lock held by another thread.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("forkserver")
+            )
+        return self._executor
+
+    def path(self, digest: str, ext: str, size: int | None = None) -> str:
+        name = f"{digest}-{size}.{ext}" if size else f"{digest}.{ext}"
+        return os.path.join(self.root, digest[:2], name)
+
+    def _reject(self, status_code: int, detail: str) -> HTTPException:
+        self.rejected += 1
+        return HTTPException(status_code=status_code, detail=detail)
+
+    async def _receive(self, request: Request, tmp: str) -> tuple[str, str]:
+        # Streams the body to `tmp`, returns the SHA-256 and the sniffed format.
+        digest = hashlib.sha256()
+        received = 0
+        head = b""
+        file = await asyncio.to_thread(open, tmp, "wb")
+        try:
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > self.max_bytes:
+                    raise self._reject(413, f"Avatar is larger than {self.max_bytes} bytes")
+                if len(head) < 12:
+                    head += chunk[:12]
+                digest.update(chunk)
+                await asyncio.to_thread(file.write, chunk)
+        finally:
+            await asyncio.to_thread(file.close)
+        ext = sniff(head)
+        if ext is None:
+            raise self._reject(415, "Avatar must be a PNG, JPEG, GIF or WebP image")
+        return digest.hexdigest(), ext
+
+    async def _resize(self, source: str, path: str):
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please try again later",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            await asyncio.get_running_loop().run_in_executor(self.executor, _make_variants, source, path, self.sizes)
+        finally:
+            self.pending -= 1
+
+    async def save(self, request: Request) -> str:
+        """
+        Stores the request body as an avatar, returns its name `<sha256>.<ext>`.
+        The image is validated and its variants written before the original is moved into place,
+        so a stored original is always a valid image.
+        """
+        try:
+            length = int(request.headers.get("content-length") or 0)
+        except ValueError:
+            raise self._reject(400, "Invalid Content-Length header")
+        if length > self.max_bytes:
+            raise self._reject(413, f"Avatar is larger than {self.max_bytes} bytes")
+
+        tmp_dir = os.path.join(self.root, "tmp")
+        await asyncio.to_thread(os.makedirs, tmp_dir, exist_ok=True)
+        tmp = os.path.join(tmp_dir, uuid.uuid4().hex)
+        try:
+            digest, ext = await self._receive(request, tmp)
+            path = self.path(digest, ext)
+            if await asyncio.to_thread(os.path.exists, path):
+                self.deduplicated += 1
+                return f"{digest}.{ext}"
+
+            await asyncio.to_thread(os.makedirs, os.path.dirname(path), exist_ok=True)
+            if Image is not None:
+                try:
+                    await self._resize(tmp, path)
+                except HTTPException:
+                    raise
+                except Exception as e:
+                    logger.info(f"Rejected avatar {digest}: {e}")
+                    raise self._reject(400, "Avatar is not a valid image")
+            await asyncio.to_thread(os.replace, tmp, path)
+        finally:
+            await asyncio.to_thread(_remove, tmp)
+        self.stored += 1
+        return f"{digest}.{ext}"
+
+    async def find(self, name: str, size: int | None = None) -> tuple[str, os.stat_result, int | None] | None:
+        """
+        Path and stat of the stored file closest to `size`: the smallest variant at least that large,
+        or the original. Returns None for unknown or malformed names.
+        """
+        match = NAME.match(name)
+        if match is None:
+            return None
+        digest, ext = match.groups()
+        candidates = [variant for variant in self.sizes if size and variant >= size][:1] + [None]
+        for variant in candidates:
+            path = self.path(digest, ext, variant)
+            try:
+                return path, await asyncio.to_thread(os.stat, path), variant
+            except FileNotFoundError:
+                continue
+        return None
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+        }
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+avatars = AvatarStore(
+    config.avatar_dir,
+    max_bytes=config.avatar_max_bytes,
+    sizes=config.avatar_sizes,
+    max_workers=config.avatar_workers,
+    max_pending=config.avatar_max_pending,
+)
+
+registry.register(GaugeCollector("astroeyes_avatars", "Avatar store state.", avatars.stats))
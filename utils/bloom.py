@@ -0,0 +1,48 @@
+import hashlib
+import math
+
+class BloomFilter:
+    """
+    Compact set membership with false positives and no false negatives.
+    Sized for `capacity` items at `error_rate`, e.g. 1.2 MB for a million items at 1%.
+    The `k` bit positions come from one BLAKE2b digest by double hashing.
+    Parameters:
+        capacity: Expected number of items, the false positive rate grows beyond it.
+        error_rate: Target false positive rate at capacity.
+    """
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> bool:
+        """
+        Adds `item`, only counting it when it was not in the filter already, so re-adding is harmless.
+        Returns:
+            True if the item was new.
+        """
+        new = False
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def __len__(self) -> int:
+        return self.count
@@ -0,0 +1,217 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+from pydantic import BaseModel
+from models.user import cachedProfile
+from utils.config import config
+from utils.log import logger
+from utils.metrics import registry, GaugeCollector
+from utils.pubsub import broker, consume
+
+class TTLCache:
+    """
+    In-process LRU where every entry also expires `ttl` seconds after it was stored.
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[object, float]] = OrderedDict()
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class RedisTier:
+    """
+    Optional shared second tier, so workers and hosts see each other's entries and invalidations.
+    Values are stored as JSON, through `model` when values are Pydantic models.
+    Errors are logged and treated as misses, the database stays the source of truth.
+    """
+    def __init__(self, url: str, prefix: str, ttl: float, model: type[BaseModel] | None = None):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("The redis package is required for a shared cache tier") from e
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+        self.model = model
+
+    async def get(self, key: str):
+        try:
+            value = await self.client.get(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Shared cache get failed: {e}")
+            return None
+        if value is None:
+            return None
+        return self.model.model_validate_json(value) if self.model else json.loads(value)
+
+    async def set(self, key: str, value):
+        try:
+            data = value.model_dump_json() if self.model else json.dumps(value)
+            await self.client.set(self.prefix + key, data, px=int(self.ttl * 1000))
+        except Exception as e:
+            logger.warning(f"Shared cache set failed: {e}")
+
+    async def delete(self, key: str):
+        try:
+            await self.client.delete(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Shared cache delete failed: {e}")
+
+class ReadThroughCache:
+    """
+    Read-through cache with an in-process LRU first and an optional shared tier second.
+    Concurrent misses on the same key are coalesced into a single `loader` call, which runs in its
+    own task so a cancelled request does not cancel the load for the others waiting on it.
+    `None` results are not cached.
+    With a `topic`, invalidations are also published on the broker and applied by every worker
+    listening on it, otherwise other workers keep their local copy until it expires.
+    For `hold` seconds after an invalidation loaded values are returned without being stored, a read
+    replica may still return the old value while it catches up.
+    """
+    def __init__(self, local: TTLCache, shared: RedisTier | None = None, topic: str | None = None, hold: float = 0):
+        self.local = local
+        self.shared = shared
+        self.topic = topic
+        self.hold = hold
+        self._held: dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.invalidations = 0
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._listener: asyncio.Task | None = None
+
+    async def get(self, key: str, loader: Callable[[str], Awaitable[object]]):
+        value = self.local.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, loader: Callable[[str], Awaitable[object]]):
+        task = asyncio.current_task()
+        if self.shared is not None:
+            value = await self.shared.get(key)
+            if value is not None:
+                if self._inflight.get(key) is task and not self.is_held(key):
+                    self.local.set(key, value)
+                return value
+
+        self.loads += 1
+        value = await loader(key)
+        # An invalidation while loading drops the task from _inflight, the result may
+        # already be stale then and is returned to the waiters without being stored.
+        if value is not None and self._inflight.get(key) is task and not self.is_held(key):
+            self.local.set(key, value)
+            if self.shared is not None:
+                await self.shared.set(key, value)
+        return value
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()
+
+    def peek(self, key: str):
+        return self.local.get(key)
+
+    def put(self, key: str, value, since: int):
+        """
+        Stores a value loaded outside `get` in the local tier. `since` is `invalidations` read before
+        the load, the value is dropped if anything was invalidated meanwhile as it may be stale.
+        """
+        if value is not None and self.invalidations == since and key not in self._inflight and not self.is_held(key):
+            self.local.set(key, value)
+
+    def is_held(self, key: str) -> bool:
+        until = self._held.get(key)
+        if until is None:
+            return False
+        if until <= time.monotonic():
+            del self._held[key]
+            return False
+        return True
+
+    def _drop(self, key: str):
+        self.invalidations += 1
+        self.local.delete(key)
+        self._inflight.pop(key, None)
+        if self.hold > 0:
+            now = time.monotonic()
+            self._held[key] = now + self.hold
+            if len(self._held) > 10000:
+                self._held = {key: until for key, until in self._held.items() if until > now}
+
+    def _lost(self):
+        self.invalidations += 1
+        self.local.clear()
+
+    async def invalidate(self, key: str):
+        self._drop(key)
+        if self.shared is not None:
+            await self.shared.delete(key)
+        if self.topic is not None:
+            broker.publish(self.topic, {"key": key})
+
+    def start(self):
+        if self.topic is not None and self._listener is None:
+            self._listener = asyncio.create_task(consume(self.topic, lambda event: self._drop(event["key"]), self._lost))
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    def stats(self) -> dict:
+        return {"size": len(self.local), "hits": self.hits, "misses": self.misses, "loads": self.loads}
+
+profile_cache = ReadThroughCache(
+    TTLCache(config.profile_cache_size, config.profile_cache_ttl),
+    RedisTier(config.profile_cache_url, "astroeyes:profile:", config.profile_cache_ttl, model=cachedProfile) if config.profile_cache_url else None,
+    # Only a cross-worker broker reaches the other workers.
+    topic="cache:profile" if config.pubsub_url else None,
+    hold=config.db_read_your_writes_window if config.db_replica_urls else 0,
+)
+
+registry.register(GaugeCollector("astroeyes_profile_cache", "Profile cache state.", profile_cache.stats))
@@ -5,7 +5,16 @@ class Config:
         with open("version") as file:
             self.version = file.read().strip()
         self.environment = os.getenv("ENVIRONMENT", "production")
-        self.secret_key = str(os.getenv("SECRET_KEY"))
+        self.secret_key = os.getenv("SECRET_KEY", "")
+        self.access_token_expire_minutes = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 15))
+        self.jwt_cache_size = int(os.getenv("JWT_CACHE_SIZE", 10000))
+        # Directory of Ed25519 / P-256 PEM keys for asymmetric signing, tokens are signed with SECRET_KEY (HS256) when empty.
+        self.jwt_key_dir = os.getenv("JWT_KEY_DIR", "")
+        self.jwt_signing_kid = os.getenv("JWT_SIGNING_KID", "")
+        self.jwt_key_reload_interval = float(os.getenv("JWT_KEY_RELOAD_INTERVAL", 60))
+        # Keep accepting HS256 tokens issued before switching to asymmetric keys, off by default once JWT_KEY_DIR is set.
+        self.jwt_accept_hs256 = os.getenv("JWT_ACCEPT_HS256", "false" if self.jwt_key_dir else "true").lower() == "true"
+        self.jwks_max_age = int(os.getenv("JWKS_MAX_AGE", 86400))
 
         
         self.db_user = os.getenv("DB_USER", "astroeyes")
@@ -15,5 +24,95 @@ class Config:
         self.db_database = os.getenv("DB_DATABASE", "astroeyes_db")
         
         self.db_connect_uri = f"postgresql+asyncpg://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_database}"
+        # Overrides the DB_* settings above, e.g. sqlite+aiosqlite:///bench.db for benchmarks.
+        self.db_connect_uri = os.getenv("DATABASE_URL", self.db_connect_uri)
+        self.db_pool_size = int(os.getenv("DB_POOL_SIZE", 10))
+        self.db_max_overflow = int(os.getenv("DB_MAX_OVERFLOW", 10))
+        self.db_pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", 30))
+        self.db_pool_recycle = int(os.getenv("DB_POOL_RECYCLE", 1800))
+        self.db_pool_pre_ping = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+        self.db_statement_cache_size = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
+        # Comma separated read replica URLs, read-only routes are balanced across them.
+        self.db_replica_urls = [url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()]
+        self.db_read_your_writes_window = float(os.getenv("DB_READ_YOUR_WRITES_WINDOW", 5))
+        self.db_replica_retry_after = float(os.getenv("DB_REPLICA_RETRY_AFTER", 30))
+
+        self.token_sweep_interval = float(os.getenv("TOKEN_SWEEP_INTERVAL", 300))
+        self.token_sweep_batch_size = int(os.getenv("TOKEN_SWEEP_BATCH_SIZE", 1000))
+        self.token_sweep_max_batches = int(os.getenv("TOKEN_SWEEP_MAX_BATCHES", 100))
+
+        # shm:// shares counters between the workers of one host, use redis:// for several hosts.
+        self.ratelimit_storage_uri = os.getenv("RATELIMIT_STORAGE_URI", "shm://")
+        self.ratelimit_enabled = os.getenv("RATELIMIT_ENABLED", "true").lower() == "true"
+
+        self.profile_cache_size = int(os.getenv("PROFILE_CACHE_SIZE", 10000))
+        self.profile_cache_ttl = float(os.getenv("PROFILE_CACHE_TTL", 30))
+        # Optional shared second tier, e.g. redis://localhost:6379/0
+        self.profile_cache_url = os.getenv("PROFILE_CACHE_URL", "")
+
+        # Server worker processes sharing the host, set by launch.py, sizes the per-worker process pools.
+        self.web_concurrency = int(os.getenv("WEB_CONCURRENCY", 1))
+        self.hash_workers = int(os.getenv("HASH_WORKERS", 0)) or max(1, (os.cpu_count() or 1) // self.web_concurrency)
+        self.hash_max_pending = int(os.getenv("HASH_MAX_PENDING", 64))
+
+        # Bloom filter of taken usernames for GET /auth/username-available, about 1.2 MB per million at 1%.
+        self.username_index_capacity = int(os.getenv("USERNAME_INDEX_CAPACITY", 1_000_000))
+        self.username_index_error_rate = float(os.getenv("USERNAME_INDEX_ERROR_RATE", 0.01))
+        self.username_index_refresh_interval = float(os.getenv("USERNAME_INDEX_REFRESH_INTERVAL", 10))
+        self.username_index_batch_size = int(os.getenv("USERNAME_INDEX_BATCH_SIZE", 10000))
+        # Catch-ups re-read this many trailing ids, for registrations committed out of id order.
+        self.username_index_rescan_ids = int(os.getenv("USERNAME_INDEX_RESCAN_IDS", 10000))
+        self.username_index_rebuild_interval = float(os.getenv("USERNAME_INDEX_REBUILD_INTERVAL", 3600))
+
+        # Registration without a valid invite code is refused when true.
+        self.invite_required = os.getenv("INVITE_REQUIRED", "false").lower() == "true"
+
+        self.avatar_dir = os.getenv("AVATAR_DIR", "data/avatars")
+        self.avatar_max_bytes = int(os.getenv("AVATAR_MAX_BYTES", 2 * 1024 * 1024))
+        self.avatar_sizes = [int(size) for size in os.getenv("AVATAR_SIZES", "64,128,256").split(",") if size.strip()]
+        self.avatar_workers = int(os.getenv("AVATAR_WORKERS", 1))
+        self.avatar_max_pending = int(os.getenv("AVATAR_MAX_PENDING", 8))
+
+        self.presence_flush_interval = float(os.getenv("PRESENCE_FLUSH_INTERVAL", 5))
+        self.presence_timeout = float(os.getenv("PRESENCE_TIMEOUT", 120))
+
+        # Optional cross-worker pub/sub backend for WebSocket events, e.g. redis://localhost:6379/0
+        self.pubsub_url = os.getenv("PUBSUB_URL", "")
+        self.ws_send_queue_size = int(os.getenv("WS_SEND_QUEUE_SIZE", 256))
+        self.ws_max_watched = int(os.getenv("WS_MAX_WATCHED", 200))
+        self.ws_revocation_check = float(os.getenv("WS_REVOCATION_CHECK", 30))
+
+        # Concurrent database-bound requests per route group (first path segment), e.g. "auth=6,token=4,user=8".
+        # Keep the sum within DB_POOL_SIZE + DB_MAX_OVERFLOW.
+        self.admission_limits = {
+            group.strip(): int(limit)
+            for group, _, limit in (item.partition("=") for item in os.getenv("ADMISSION_LIMITS", "auth=6,token=4,user=6").split(",") if item.strip())
+        }
+        self.admission_default_limit = int(os.getenv("ADMISSION_DEFAULT_LIMIT", 4))
+        self.admission_queue_size = int(os.getenv("ADMISSION_QUEUE_SIZE", 64))
+        self.admission_retry_after = int(os.getenv("ADMISSION_RETRY_AFTER", 1))
+        # Seconds a request may wait for admission, counted from its arrival.
+        self.request_deadline = float(os.getenv("REQUEST_DEADLINE", 5))
+
+        self.log_level = os.getenv("LOG_LEVEL", "INFO").upper()
+        self.log_format = os.getenv("LOG_FORMAT", "json")
+        self.log_queue_size = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+        # Fraction of requests written to the access log, per route template overrides as "/user/me=0.01,/metrics=0".
+        self.log_access_sample_rate = float(os.getenv("LOG_ACCESS_SAMPLE_RATE", 1.0))
+        self.log_access_route_sample_rates = {
+            route.strip(): float(rate)
+            for route, _, rate in (item.rpartition("=") for item in os.getenv("LOG_ACCESS_ROUTE_SAMPLE_RATES", "").split(",") if item.strip())
+        }
+        # Server errors and requests slower than this are always logged, whatever the sample rate.
+        self.log_slow_request_ms = float(os.getenv("LOG_SLOW_REQUEST_MS", 1000))
+
+        # Request profiling is off unless a sample rate or a token for the X-Profile header is set.
+        self.profile_sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+        self.profile_token = os.getenv("PROFILE_TOKEN", "")
+        self.profile_dir = os.getenv("PROFILE_DIR", "data/profiles")
+        self.profile_max_files = int(os.getenv("PROFILE_MAX_FILES", 100))
+        self.profile_max_active = int(os.getenv("PROFILE_MAX_ACTIVE", 1))
+        self.profile_interval_ms = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+        self.profile_max_seconds = float(os.getenv("PROFILE_MAX_SECONDS", 30))
         
 config = Config()         
\ No newline at end of file
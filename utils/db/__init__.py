@@ -1,26 +1,85 @@
-from sqlalchemy import text
-from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy import text, any_, bindparam
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
 from contextlib import asynccontextmanager
 
+from utils.admission import admission
 from utils.config import config
+from utils.db.pool import InstrumentedQueuePool
+from utils.metrics import registry, instrument_engine, GaugeCollector
 
 DATABASE_URL = config.db_connect_uri
 
-engine = create_async_engine(DATABASE_URL)
+DATABASE_BACKEND = make_url(DATABASE_URL).get_backend_name()
+
+def create_engine(url: str) -> AsyncEngine:
+    """
+    Creates an instrumented engine with the configured pool settings, for the primary or a replica.
+    """
+    new_engine = create_async_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=config.db_pool_size,
+        max_overflow=config.db_max_overflow,
+        pool_timeout=config.db_pool_timeout,
+        pool_recycle=config.db_pool_recycle,
+        pool_pre_ping=config.db_pool_pre_ping,
+        connect_args=(
+            {"prepared_statement_cache_size": config.db_statement_cache_size}
+            if make_url(url).get_backend_name() == "postgresql" else {}
+        ),
+    )
+    instrument_engine(new_engine.sync_engine)
+    return new_engine
+
+engine = create_engine(DATABASE_URL)
+
+# Dialect-specific INSERT with on_conflict_do_update(), PostgreSQL in production, SQLite for benchmarks.
+insert = sqlite.insert if DATABASE_BACKEND == "sqlite" else postgresql.insert
+
+def matches_any(column, values: list):
+    """
+    `column = ANY(:values)` with the values bound as one array on PostgreSQL, so the statement text
+    (and its prepared statement) does not change with the number of values. Falls back to IN elsewhere.
+    """
+    if DATABASE_BACKEND == "postgresql":
+        return column == any_(bindparam(None, list(values), type_=postgresql.ARRAY(column.type)))
+    return column.in_(values)
+
+class PrimarySession(Session):
+    """
+    Sync session class behind sessions on the primary, a distinct class so write tracking
+    (see `utils.db.replicas`) only listens to primary sessions.
+    """
 
 AsyncSessionLocal = sessionmaker(
     engine,
     class_=AsyncSession,
+    sync_session_class=PrimarySession,
     expire_on_commit=False 
 )
 async def get_session():
-    async with AsyncSessionLocal() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
+    """
+    Session on the primary, behind the admission gate of the request's route group.
+    """
+    async with admission.slot():
+        async with AsyncSessionLocal() as session:
+            try:
+                yield session
+            finally:
+                await session.close()
+
+def pool_stats() -> dict:
+    """
+    Live connection pool statistics of this process: size, checked out connections,
+    overflow, waiters and the time spent waiting for a connection.
+    """
+    return engine.pool.stats()
+
+registry.register(GaugeCollector("astroeyes_db_pool", "Database connection pool state.", pool_stats))
 
 async def test_db() -> bool:
     async with engine.begin() as conn:
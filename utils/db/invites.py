@@ -0,0 +1,68 @@
+import secrets
+from datetime import datetime, timezone
+from sqlalchemy import update, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from utils.db import insert
+from utils.db.schemas import InviteCode
+
+# No 0/O or 1/I, codes are typed by hand.
+ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+
+def new_code(length: int = 12) -> str:
+    return "".join(secrets.choice(ALPHABET) for _ in range(length))
+
+async def redeem(db: AsyncSession, code: str) -> bool:
+    """
+    Counts one use of `code` if it exists, has uses left and has not expired, in one conditional
+    UPDATE ... RETURNING, so concurrent registrations never read-modify-write the counter.
+    The row stays locked until the caller's transaction ends, run it right before the commit.
+    Returns:
+        True if the code was redeemed, False otherwise.
+    """
+    result = await db.execute(
+        update(InviteCode)
+        .where(
+            InviteCode.code == code,
+            or_(InviteCode.max_uses.is_(None), InviteCode.used_times < InviteCode.max_uses),
+            or_(InviteCode.expires_at.is_(None), InviteCode.expires_at > datetime.now(timezone.utc)),
+        )
+        .values(used_times=InviteCode.used_times + 1)
+        .returning(InviteCode.id)
+    )
+    return result.first() is not None
+
+async def generate(
+    db: AsyncSession,
+    count: int,
+    max_uses: int | None = 1,
+    expires_at: datetime | None = None,
+    created_by_user_uuid: str | None = None,
+    chunk_size: int = 5000,
+):
+    """
+    Creates `count` invite codes with one multi-row INSERT per chunk, each chunk committed on its own.
+    Codes colliding with existing ones are skipped by ON CONFLICT DO NOTHING and replaced in the next statement.
+    Yields:
+        The list of codes created by each statement.
+    """
+    now = datetime.now(timezone.utc)
+    remaining = count
+    while remaining > 0:
+        rows = [
+            {
+                "code": new_code(),
+                "created_at": now,
+                "created_by_user_uuid": created_by_user_uuid,
+                "used_times": 0,
+                "max_uses": max_uses,
+                "expires_at": expires_at,
+            }
+            for _ in range(min(remaining, chunk_size))
+        ]
+        result = await db.execute(
+            insert(InviteCode).values(rows).on_conflict_do_nothing(index_elements=[InviteCode.code]).returning(InviteCode.code)
+        )
+        codes = result.scalars().all()
+        await db.commit()
+        remaining -= len(codes)
+        yield codes
@@ -0,0 +1,153 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import update, values, column, bindparam, String, DateTime
+from sqlalchemy.ext.asyncio import AsyncEngine
+from utils.config import config
+from utils.db import engine
+from utils.db.schemas import User
+from utils.log import logger
+from utils.metrics import registry, GaugeCollector
+from utils.pubsub import broker, user_topic
+
+class PresenceTracker:
+    """
+    Coalesces user activity into periodic bulk writes of `users.is_online` and `users.last_online_at`.
+    `touch()` only records the time in memory. Every `flush_interval` the users seen since the last flush are
+    written with one `UPDATE ... FROM (VALUES ...)` per chunk, so each active user costs at most one row
+    update per interval however many requests they make. Users not seen on any worker for `timeout`
+    are marked offline in one statement, guarded by `last_online_at` so workers never undo each other.
+    Users going online on this worker and users marked offline are published to their `user:<uuid>` topic.
+    Parameters:
+        engine: The engine to write with.
+        flush_interval: Seconds between flushes.
+        timeout: Seconds without activity after which a user is marked offline.
+        chunk_size: Maximum rows per UPDATE statement.
+    """
+    def __init__(self, engine: AsyncEngine, flush_interval: float, timeout: float, chunk_size: int = 1000):
+        self.engine = engine
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.seen: dict[str, datetime] = {}
+        # Users this worker has seen within `timeout`, monotonic time of their last activity.
+        self.active: dict[str, float] = {}
+        self.flushed_online = 0
+        self.flushed_offline = 0
+        self.flushes = 0
+        self._last_timeout_check = 0.0
+        self._task: asyncio.Task | None = None
+
+    def touch(self, user_uuid: str):
+        self.seen[user_uuid] = datetime.now(timezone.utc)
+        if user_uuid not in self.active:
+            broker.publish(user_topic(user_uuid), {"type": "presence", "uuid": user_uuid, "online": True})
+        self.active[user_uuid] = time.monotonic()
+
+    async def _mark_online(self, conn, seen: list[tuple[str, datetime]]):
+        for i in range(0, len(seen), self.chunk_size):
+            chunk = seen[i:i + self.chunk_size]
+            if self.engine.dialect.name == "postgresql":
+                rows = values(
+                    column("uuid", String), column("seen_at", DateTime(timezone=True)), name="seen"
+                ).data(chunk)
+                await conn.execute(
+                    update(User)
+                    .where(User.uuid == rows.c.uuid, User.last_online_at < rows.c.seen_at)
+                    .values(is_online=True, last_online_at=rows.c.seen_at)
+                )
+            else:
+                # No column aliases on VALUES in SQLite, one executemany instead.
+                await conn.execute(
+                    update(User)
+                    .where(User.uuid == bindparam("seen_uuid"), User.last_online_at < bindparam("seen_at"))
+                    .values(is_online=True, last_online_at=bindparam("seen_at")),
+                    [{"seen_uuid": uuid, "seen_at": seen_at} for uuid, seen_at in chunk],
+                )
+            await conn.commit()
+        self.flushed_online += len(seen)
+
+    async def _mark_offline(self, conn) -> int:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.timeout)
+        result = await conn.execute(
+            update(User)
+            .where(User.is_online.is_(True), User.last_online_at < cutoff)
+            .values(is_online=False)
+            .returning(User.uuid)
+        )
+        offline = result.scalars().all()
+        await conn.commit()
+
+        idle = time.monotonic() - self.timeout
+        self.active = {uuid: last for uuid, last in self.active.items() if last > idle}
+        for uuid in offline:
+            self.active.pop(uuid, None)
+            broker.publish(user_topic(uuid), {"type": "presence", "uuid": uuid, "online": False})
+        self.flushed_offline += len(offline)
+        return len(offline)
+
+    async def flush(self, mark_offline: bool = True):
+        """
+        Writes the users seen since the last flush, and marks timed out users offline
+        at most every `timeout / 2` seconds.
+        """
+        seen, self.seen = self.seen, {}
+        check_timeouts = mark_offline and time.monotonic() - self._last_timeout_check >= self.timeout / 2
+        if not seen and not check_timeouts:
+            return
+        async with self.engine.connect() as conn:
+            if seen:
+                try:
+                    await self._mark_online(conn, list(seen.items()))
+                except Exception:
+                    # Keep the activity for the next flush, newer touches win.
+                    for uuid, seen_at in seen.items():
+                        self.seen.setdefault(uuid, seen_at)
+                    raise
+            if check_timeouts:
+                self._last_timeout_check = time.monotonic()
+                await self._mark_offline(conn)
+        self.flushes += 1
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Presence flush failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush(mark_offline=False)
+        except Exception as e:
+            logger.error(f"Final presence flush failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self.seen),
+            "flushes": self.flushes,
+            "flushed_online": self.flushed_online,
+            "flushed_offline": self.flushed_offline,
+        }
+
+presence = PresenceTracker(
+    engine,
+    flush_interval=config.presence_flush_interval,
+    timeout=config.presence_timeout,
+)
+
+registry.register(GaugeCollector("astroeyes_presence", "Presence tracker state.", presence.stats))
@@ -0,0 +1,192 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from sqlalchemy import event, Executable, Result
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from utils.admission import admission
+from utils.config import config
+from utils.db import engine, create_engine, PrimarySession
+from utils.log import logger
+from utils.metrics import registry, GaugeCollector
+from utils.pubsub import broker, consume
+
+# Authenticated user of the request being handled, set by `get_user_uuid`.
+current_user: ContextVar[str | None] = ContextVar("current_user", default=None)
+
+class ReplicaSet:
+    """
+    Routes read-only queries to read replicas, round robin.
+    A replica that fails to connect or loses its connection is skipped for `retry_after` seconds, reads
+    fall back to the primary when no replica is available, and `execute` retries a query that failed on
+    a replica on the primary. Users who committed a write on the primary are pinned to it for
+    `pin_window` seconds so they read their own writes despite replication lag. With a `topic`, pins are
+    published on the broker so every worker applies them, otherwise they are kept per worker.
+    Parameters:
+        primary: The primary engine.
+        replicas: One engine per replica, may be empty.
+        pin_window: Seconds a user's reads stay on the primary after a write.
+        retry_after: Seconds a failed replica is skipped.
+        topic: Optional, broker topic pins are shared on.
+    """
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: list[AsyncEngine],
+        pin_window: float,
+        retry_after: float,
+        topic: str | None = None,
+    ):
+        self.primary = primary
+        self.replicas = replicas
+        self.pin_window = pin_window
+        self.retry_after = retry_after
+        self.topic = topic
+        self.down_until = [0.0] * len(replicas)
+        self.pins: dict[str, float] = {}
+        self._next = 0
+        self._listener: asyncio.Task | None = None
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.pinned_reads = 0
+        self.fallbacks = 0
+        self.retries = 0
+
+    def pin(self, user_uuid: str):
+        self._pin(user_uuid)
+        if self.topic is not None:
+            broker.publish(self.topic, {"user": user_uuid})
+
+    def _pin(self, user_uuid: str):
+        now = time.monotonic()
+        self.pins[user_uuid] = now + self.pin_window
+        if len(self.pins) > 10000:
+            self.pins = {uuid: until for uuid, until in self.pins.items() if until > now}
+
+    def is_pinned(self, user_uuid: str | None) -> bool:
+        if user_uuid is None:
+            return False
+        until = self.pins.get(user_uuid)
+        if until is None:
+            return False
+        if until <= time.monotonic():
+            del self.pins[user_uuid]
+            return False
+        return True
+
+    def pick(self) -> int | None:
+        now = time.monotonic()
+        for _ in range(len(self.replicas)):
+            index = self._next
+            self._next = (self._next + 1) % len(self.replicas)
+            if self.down_until[index] <= now:
+                return index
+        return None
+
+    def mark_down(self, index: int, error: Exception):
+        self.down_until[index] = time.monotonic() + self.retry_after
+        logger.warning(f"Read replica {index} unavailable for {self.retry_after:.0f}s: {error}")
+
+    def _route(self) -> int | None:
+        # The replica to read from, None for the primary.
+        if not self.replicas:
+            self.primary_reads += 1
+            return None
+        if self.is_pinned(current_user.get()):
+            self.pinned_reads += 1
+            return None
+        index = self.pick()
+        if index is None:
+            self.fallbacks += 1
+        return index
+
+    async def _connect(self, index: int) -> AsyncSession | None:
+        session = AsyncSession(self.replicas[index], expire_on_commit=False)
+        try:
+            # Connect up front so an unreachable replica falls back instead of failing the request.
+            await session.connection()
+        except (DBAPIError, OSError) as e:
+            await session.close()
+            self.mark_down(index, e)
+            self.fallbacks += 1
+            return None
+        self.replica_reads += 1
+        return session
+
+    async def execute(self, statement: Executable) -> Result:
+        """
+        Runs a read-only statement on a replica when one is available and the current user has not
+        written recently, on the primary otherwise or when it fails on the replica.
+        Held behind the request's admission gate. The result is buffered, rows stay readable.
+        """
+        async with admission.slot():
+            index = self._route()
+            if index is not None and (session := await self._connect(index)) is not None:
+                try:
+                    return await session.execute(statement)
+                except (DBAPIError, OSError) as e:
+                    if not isinstance(e, DBAPIError) or e.connection_invalidated:
+                        self.mark_down(index, e)
+                    else:
+                        logger.warning(f"Read replica {index} query failed, retrying on the primary: {e}")
+                    self.retries += 1
+                finally:
+                    await session.close()
+            async with AsyncSession(self.primary, expire_on_commit=False) as session:
+                return await session.execute(statement)
+
+    def start(self):
+        if self.topic is not None and self._listener is None:
+            self._listener = asyncio.create_task(consume(self.topic, lambda event: self._pin(event["user"]), lambda: None))
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "replicas": len(self.replicas),
+            "replicas_up": sum(1 for until in self.down_until if until <= now),
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "pinned_reads": self.pinned_reads,
+            "fallbacks": self.fallbacks,
+            "retries": self.retries,
+            "pinned_users": len(self.pins),
+        }
+
+    async def dispose(self):
+        for replica in self.replicas:
+            await replica.dispose()
+
+replicas = ReplicaSet(
+    engine,
+    [create_engine(url) for url in config.db_replica_urls],
+    pin_window=config.db_read_your_writes_window,
+    retry_after=config.db_replica_retry_after,
+    # Only a cross-worker broker reaches the other workers.
+    topic="replicas:pin" if config.pubsub_url and config.db_replica_urls else None,
+)
+
+# Any INSERT/UPDATE/DELETE committed on the primary pins the request's user to it.
+@event.listens_for(PrimarySession, "do_orm_execute")
+def _track_write(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["wrote"] = True
+
+@event.listens_for(PrimarySession, "after_flush")
+def _track_flush(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(PrimarySession, "after_commit")
+def _pin_writer(session):
+    if session.info.pop("wrote", False) and (user_uuid := current_user.get()) is not None:
+        replicas.pin(user_uuid)
+
+registry.register(GaugeCollector("astroeyes_db_replicas", "Read replica routing state.", replicas.stats))
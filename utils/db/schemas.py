@@ -1,6 +1,6 @@
 import uuid
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Index, func
 from sqlalchemy_utils import PasswordType, force_auto_coercion
 from sqlalchemy.orm import relationship
 
@@ -18,6 +18,12 @@ class User(Base):
     is_online = Column(Boolean, default=False)
     last_online_at = Column(DateTime(timezone=True), default=func.now(), nullable=False)
     registered_at = Column(DateTime(timezone=True), default=func.now(), nullable=False)
+    profile_version = Column(Integer, default=1, server_default="1", nullable=False)
+
+    __table_args__ = (
+        # Only online users are indexed, for the presence timeout sweep.
+        Index("ix_users_online_last_online_at", "last_online_at", postgresql_where=is_online.is_(True), sqlite_where=is_online.is_(True)),
+    )
 
     tokens = relationship(
         "UserRefreshToken",
@@ -37,13 +43,17 @@ class UserRefreshToken(Base):
     id = Column(Integer, primary_key=True, index=True)
     token_uuid = Column(String(36), unique=True, default=lambda: str(uuid.uuid4()), nullable=False, index=True)
     user_uuid = Column(String(36), ForeignKey("users.uuid"), nullable=False)
-    token = Column(String(256), unique=True, nullable=False)
+    token = Column(String(512), unique=True, nullable=False)
     device_id = Column(String(64), nullable=False)
     created_at = Column(DateTime(timezone=True), default=func.now(), nullable=False)
-    expires_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
 
     user = relationship("User", back_populates="tokens")
 
+    __table_args__ = (
+        Index("uq_user_tokens_user_uuid_device_id", "user_uuid", "device_id", unique=True),
+    )
+
 class InviteCode(Base):
     __tablename__ = "invite_codes"
     id = Column(Integer, primary_key=True, index=True)
@@ -51,5 +61,8 @@ class InviteCode(Base):
     created_at = Column(DateTime(timezone=True), default=func.now(), nullable=False)
     created_by_user_uuid = Column(String(36), ForeignKey("users.uuid"), nullable=True)
     used_times = Column(Integer, default=0, nullable=False)
+    # NULL: unlimited uses / never expires.
+    max_uses = Column(Integer, nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=True)
 
     user = relationship("User", back_populates="invite_codes")
@@ -0,0 +1,117 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from sqlalchemy import delete, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from utils.config import config
+from utils.db import engine
+from utils.db.schemas import UserRefreshToken
+from utils.log import logger
+from utils.metrics import registry, GaugeCollector
+
+# Arbitrary application-wide key for pg_try_advisory_lock.
+SWEEPER_LOCK_KEY = 730115001
+
+class TokenSweeper:
+    """
+    Background task deleting expired refresh tokens in bounded batches, oldest `expires_at` first.
+    On PostgreSQL a session-level advisory lock makes sure only one worker sweeps at a time,
+    the others skip the cycle. Each batch is its own short transaction.
+    Parameters:
+        engine: The engine to sweep with.
+        interval: Seconds between sweep cycles.
+        batch_size: Maximum rows deleted per statement.
+        max_batches: Maximum batches per cycle, the rest is left for the next cycle.
+    """
+    def __init__(self, engine: AsyncEngine, interval: float, batch_size: int, max_batches: int):
+        self.engine = engine
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.last_swept = 0
+        self.total_swept = 0
+        self.cycles = 0
+        self._task: asyncio.Task | None = None
+
+    async def sweep_once(self) -> int | None:
+        """
+        Runs one sweep cycle.
+        Returns:
+            The number of rows deleted, or None if another worker holds the sweeper lock.
+        """
+        use_lock = self.engine.dialect.name == "postgresql"
+        async with self.engine.connect() as conn:
+            if use_lock:
+                locked = (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": SWEEPER_LOCK_KEY})).scalar()
+                await conn.commit()
+                if not locked:
+                    return None
+            try:
+                swept = 0
+                for _ in range(self.max_batches):
+                    expired = (
+                        select(UserRefreshToken.id)
+                        .where(UserRefreshToken.expires_at <= datetime.now(timezone.utc))
+                        .order_by(UserRefreshToken.expires_at)
+                        .limit(self.batch_size)
+                        .scalar_subquery()
+                    )
+                    result = await conn.execute(delete(UserRefreshToken).where(UserRefreshToken.id.in_(expired)))
+                    await conn.commit()
+                    swept += result.rowcount
+                    if result.rowcount < self.batch_size:
+                        break
+                return swept
+            finally:
+                if use_lock:
+                    # A failed batch leaves the transaction aborted, the unlock would fail too and the
+                    # pooled connection would keep the lock.
+                    await conn.rollback()
+                    try:
+                        await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SWEEPER_LOCK_KEY})
+                        await conn.commit()
+                    except Exception:
+                        # Closing the session releases the lock, the connection is not returned to the pool.
+                        await conn.invalidate()
+                        raise
+
+    async def run(self):
+        while True:
+            start = time.perf_counter()
+            try:
+                swept = await self.sweep_once()
+                if swept is not None:
+                    self.cycles += 1
+                    self.last_swept = swept
+                    self.total_swept += swept
+                    logger.info(f"Token sweeper deleted {swept} expired refresh token(s) in {time.perf_counter() - start:.3f}s")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Token sweeper cycle failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"cycles": self.cycles, "last_swept": self.last_swept, "total_swept": self.total_swept}
+
+token_sweeper = TokenSweeper(
+    engine,
+    interval=config.token_sweep_interval,
+    batch_size=config.token_sweep_batch_size,
+    max_batches=config.token_sweep_max_batches,
+)
+
+registry.register(GaugeCollector("astroeyes_token_sweeper", "Expired refresh token sweeper state.", token_sweeper.stats))
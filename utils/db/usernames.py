@@ -0,0 +1,167 @@
+import asyncio
+import time
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine
+from utils.bloom import BloomFilter
+from utils.config import config
+from utils.db import engine
+from utils.db.replicas import replicas
+from utils.db.schemas import User
+from utils.log import logger
+from utils.metrics import registry, GaugeCollector
+
+class UsernameIndex:
+    """
+    Bloom filter of taken usernames, answering availability checks without the database for clear misses.
+    A background task streams `users.username` in keyset batches by id at startup, then picks up users
+    registered on other workers every `refresh_interval` seconds, `add()` covers this worker's own
+    registrations right away. Ids are assigned at insert but transactions commit out of order, so each
+    catch-up re-reads the last `rescan_ids` ids, and the filter is rebuilt from scratch every
+    `rebuild_interval` seconds in case a commit lagged even further. Usernames are never changed or
+    deleted, so the filter only grows; once it holds more than its capacity it is rebuilt at twice the
+    size to keep the false positive rate.
+    A filter hit may be a false positive and is confirmed with one query. A miss is advisory,
+    `register` stays authoritative.
+    Parameters:
+        engine: The engine to stream usernames from.
+        capacity: Initial number of usernames the filter is sized for.
+        error_rate: Target false positive rate.
+        refresh_interval: Seconds between catch-ups with other workers' registrations.
+        batch_size: Usernames read per query.
+        rescan_ids: Ids below the highest one seen that each catch-up reads again.
+        rebuild_interval: Seconds between full rebuilds.
+    """
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        capacity: int,
+        error_rate: float,
+        refresh_interval: float,
+        batch_size: int,
+        rescan_ids: int,
+        rebuild_interval: float,
+    ):
+        self.engine = engine
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.batch_size = batch_size
+        self.rescan_ids = rescan_ids
+        self.rebuild_interval = rebuild_interval
+        self.built_at = 0.0
+        self.filter = BloomFilter(capacity, error_rate)
+        self.last_id = 0
+        self.ready = False
+        # Usernames added while a new filter is being built, replayed into it.
+        self._added: list[str] | None = None
+        self.filtered = 0
+        self.confirmed = 0
+        self.false_positives = 0
+        self._task: asyncio.Task | None = None
+
+    def add(self, username: str):
+        self.filter.add(username)
+        if self._added is not None:
+            self._added.append(username)
+
+    async def catch_up(self, bloom: BloomFilter, after_id: int) -> int:
+        """
+        Adds the usernames of users with an id above `after_id` to `bloom`.
+        Returns:
+            The highest id read.
+        """
+        async with self.engine.connect() as conn:
+            while True:
+                rows = (await conn.execute(
+                    select(User.id, User.username).where(User.id > after_id).order_by(User.id).limit(self.batch_size)
+                )).all()
+                await conn.rollback()
+                for _, username in rows:
+                    bloom.add(username)
+                if rows:
+                    after_id = rows[-1].id
+                if len(rows) < self.batch_size:
+                    return after_id
+
+    async def build(self, capacity: int):
+        # Built aside and swapped in, checks keep using the current filter meanwhile.
+        start = time.perf_counter()
+        bloom = BloomFilter(capacity, self.error_rate)
+        self._added = []
+        try:
+            last_id = await self.catch_up(bloom, 0)
+            for username in self._added:
+                bloom.add(username)
+        finally:
+            self._added = None
+        self.filter, self.last_id, self.ready = bloom, last_id, True
+        self.built_at = time.monotonic()
+        logger.info(f"Username index built with {len(bloom)} usernames in {time.perf_counter() - start:.3f}s")
+
+    async def run(self):
+        while True:
+            try:
+                if (
+                    not self.ready
+                    or len(self.filter) > self.filter.capacity
+                    or time.monotonic() - self.built_at > self.rebuild_interval
+                ):
+                    await self.build(max(self.filter.capacity, len(self.filter) * 2))
+                else:
+                    # Re-adding the rescanned usernames does not count them again.
+                    last_id = await self.catch_up(self.filter, max(0, self.last_id - self.rescan_ids))
+                    self.last_id = max(self.last_id, last_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Username index refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def is_taken(self, username: str) -> bool:
+        """
+        Whether `username` is taken, from the filter alone when it is certainly free,
+        with a query on a read replica otherwise or while the filter is being built.
+        """
+        if self.ready and username not in self.filter:
+            self.filtered += 1
+            return False
+        self.confirmed += 1
+        taken = (await replicas.execute(select(User.id).where(User.username == username))).first() is not None
+        if self.ready and not taken:
+            self.false_positives += 1
+        return taken
+
+    def stats(self) -> dict:
+        return {
+            "ready": int(self.ready),
+            "usernames": len(self.filter),
+            "capacity": self.filter.capacity,
+            "bytes": len(self.filter.bits),
+            "filtered": self.filtered,
+            "confirmed": self.confirmed,
+            "false_positives": self.false_positives,
+        }
+
+usernames = UsernameIndex(
+    engine,
+    capacity=config.username_index_capacity,
+    error_rate=config.username_index_error_rate,
+    refresh_interval=config.username_index_refresh_interval,
+    batch_size=config.username_index_batch_size,
+    rescan_ids=config.username_index_rescan_ids,
+    rebuild_interval=config.username_index_rebuild_interval,
+)
+
+registry.register(GaugeCollector("astroeyes_username_index", "Username availability filter state.", usernames.stats))
@@ -0,0 +1,37 @@
+import hashlib
+from fastapi import Request, Response
+
+def make_etag(*parts) -> str:
+    """
+    Builds a strong ETag from the parts that identify a representation, e.g. a resource id and its version.
+    """
+    digest = hashlib.blake2b("\x1f".join(str(p) for p in parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+def if_none_match(request: Request, etag: str) -> bool:
+    """
+    Returns True if the request's `If-None-Match` header matches `etag`.
+    Uses the weak comparison RFC 9110 requires for `If-None-Match`.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+def check_etag(request: Request, response: Response, etag: str) -> Response | None:
+    """
+    Conditional GET helper for routes.
+    Sets `ETag` on the route's response and returns a ready 304 response when the client's copy is current,
+    so the route can return it before doing any database or serialization work:
+        if (not_modified := check_etag(request, response, etag)) is not None:
+            return not_modified
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
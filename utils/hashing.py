@@ -0,0 +1,94 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from sqlalchemy_utils.types.password import Password
+from utils.config import config
+from utils.metrics import registry, password_cpu, GaugeCollector
+
+pwd_context = CryptContext(schemes=["pbkdf2_sha512"], deprecated="auto")
+
+def _hash(secret: str) -> bytes:
+    return pwd_context.hash(secret).encode("utf8")
+
+def _verify(secret: str, hashed: bytes) -> bool:
+    return pwd_context.verify(secret, hashed)
+
+def _timed(fn, *args):
+    start = time.process_time()
+    result = fn(*args)
+    return result, time.process_time() - start
+
+class PasswordHasher:
+    """
+    Runs PBKDF2 hashing and verification in a bounded process pool so the event loop stays free.
+    Parameters:
+        max_workers: Number of worker processes, defaults to the CPU count. Every server worker has its own
+            pool, the configured default splits the CPUs between them.
+        max_pending: Maximum number of hash/verify jobs queued or running at once.
+    Raises:
+        HTTPException: 503 when the queue is full, so callers shed load instead of piling up.
+    """
+    def __init__(self, max_workers: int | None = None, max_pending: int = 64):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor: ProcessPoolExecutor | None = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Created inside a running, multi-threaded worker (event loop, log listener, profiler),
+            # forking it could deadlock the child on a lock held by another thread.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("forkserver")
+            )
+        return self._executor
+
+    async def _submit(self, fn, *args):
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please try again later",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result, cpu = await loop.run_in_executor(self.executor, _timed, fn, *args)
+            password_cpu.inc(fn.__name__.lstrip("_"), amount=cpu)
+            return result
+        finally:
+            self.pending -= 1
+
+    async def hash(self, secret: str) -> Password:
+        """
+        Hashes a plain password, the result can be assigned directly to `User.password`.
+        """
+        return Password(await self._submit(_hash, secret))
+
+    async def verify(self, secret: str, hashed: Password | None) -> bool:
+        """
+        Verifies a plain password against the stored `User.password` value.
+        """
+        if hashed is None or hashed.hash is None:
+            return False
+        return await self._submit(_verify, secret, hashed.hash)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+hasher = PasswordHasher(
+    max_workers=config.hash_workers,
+    max_pending=config.hash_max_pending,
+)
+
+registry.register(GaugeCollector(
+    "astroeyes_password_hasher", "Password hasher pool state.",
+    lambda: {"pending": hasher.pending, "max_pending": hasher.max_pending, "workers": hasher.max_workers},
+))
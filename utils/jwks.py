@@ -0,0 +1,178 @@
+import json
+import os
+import time
+from jwt.algorithms import has_crypto, get_default_algorithms
+from utils.config import config
+from utils.etag import make_etag
+from utils.log import logger
+from utils.metrics import registry, GaugeCollector
+
+class JWTKey:
+    """
+    A key of the ring with its prebuilt key objects, the private key is None for retired keys.
+    """
+    def __init__(self, kid: str, algorithm: str, public_key, private_key, created: float):
+        self.kid = kid
+        self.algorithm = algorithm
+        self.public_key = public_key
+        self.private_key = private_key
+        self.created = created
+
+def _algorithm(public_key) -> str | None:
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+    if isinstance(public_key, ed25519.Ed25519PublicKey):
+        return "EdDSA"
+    if isinstance(public_key, ec.EllipticCurvePublicKey) and isinstance(public_key.curve, ec.SECP256R1):
+        return "ES256"
+    return None
+
+def _load(path: str) -> tuple:
+    from cryptography.hazmat.primitives import serialization
+    with open(path, "rb") as file:
+        data = file.read()
+    if b"PRIVATE KEY" in data:
+        private_key = serialization.load_pem_private_key(data, password=None)
+        return private_key.public_key(), private_key
+    return serialization.load_pem_public_key(data), None
+
+class KeyRing:
+    """
+    Asymmetric JWT keys loaded from PEM files in `directory`, one key per file named after its `kid`:
+    `<kid>.pem` holds a private key that can sign, `<kid>.pub.pem` a public key kept to verify
+    tokens of a retired signer. Ed25519 keys sign with EdDSA, P-256 keys with ES256.
+        openssl genpkey -algorithm ed25519 -out keys/2026-10.pem
+        openssl pkey -in keys/2026-10.pem -pubout -out keys/2026-10.pub.pem  # to retire it
+    Every key is published in the JWKS document. A new key only starts signing once its file is
+    older than `publish_before_use` seconds (the JWKS cache lifetime), so every verifier has seen it
+    first, unless `signing_kid` names the signing key explicitly. The age comes from the file's mtime:
+    deploys that copy keys reset it, preserve it (`cp -p`, `rsync -t`) or set `signing_kid` instead.
+    The directory is checked for changes at most every `reload_interval` seconds.
+    Without a usable signing key the ring refuses to start, and a reload that loses it keeps the
+    last good signer, tokens are never silently signed with SECRET_KEY instead.
+    Verification keys are prebuilt and looked up by `kid`, the algorithm always comes from the key,
+    never from the token header.
+    Parameters:
+        directory: Key directory, asymmetric signing is disabled when empty.
+        signing_kid: Optional, the kid of the signing key.
+        publish_before_use: Seconds a key is published before it signs.
+        reload_interval: Seconds between checks of the directory.
+    """
+    def __init__(self, directory: str, signing_kid: str, publish_before_use: float, reload_interval: float):
+        self.directory = directory
+        self.signing_kid = signing_kid
+        self.publish_before_use = publish_before_use
+        self.reload_interval = reload_interval
+        self.keys: dict[str, JWTKey] = {}
+        self.signing: JWTKey | None = None
+        self.jwks = b'{"keys":[]}'
+        self.jwks_etag = make_etag("jwks", self.jwks.decode())
+        self.reloads = 0
+        self._directory_mtime: int | None = None
+        self._checked_at = 0.0
+        if directory:
+            if not has_crypto:
+                raise RuntimeError("The cryptography package is required for asymmetric JWT signing")
+            self.load()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def load(self):
+        self._directory_mtime = os.stat(self.directory).st_mtime_ns
+        keys: dict[str, JWTKey] = {}
+        for entry in sorted(os.scandir(self.directory), key=lambda entry: entry.name):
+            if not entry.name.endswith(".pem") or not entry.is_file():
+                continue
+            kid = entry.name.removesuffix(".pem").removesuffix(".pub")
+            try:
+                public_key, private_key = _load(entry.path)
+            except ValueError as e:
+                logger.error(f"Skipping JWT key {entry.name}: {e}")
+                continue
+            algorithm = _algorithm(public_key)
+            if algorithm is None:
+                logger.error(f"Skipping JWT key {entry.name}: only Ed25519 and P-256 keys are supported")
+                continue
+            if kid in keys and keys[kid].private_key is not None:
+                continue
+            keys[kid] = JWTKey(kid, algorithm, public_key, private_key, entry.stat().st_mtime)
+
+        signing = self._select_signer(keys)
+        if signing is None:
+            if self.signing is None:
+                raise RuntimeError(f"No usable JWT signing key in {self.directory}")
+            logger.error(f"No usable JWT signing key in {self.directory}, keeping {self.signing.kid}")
+            signing = self.signing
+            keys.setdefault(signing.kid, signing)
+
+        algorithms = get_default_algorithms()
+        jwks = []
+        for key in keys.values():
+            jwk = algorithms[key.algorithm].to_jwk(key.public_key, as_dict=True)
+            jwks.append({**jwk, "kid": key.kid, "alg": key.algorithm, "use": "sig"})
+        self.keys = keys
+        self.signing = signing
+        self.jwks = json.dumps({"keys": jwks}, separators=(",", ":")).encode()
+        self.jwks_etag = make_etag("jwks", self.jwks.decode())
+        self.reloads += 1
+        logger.info(f"Loaded {len(keys)} JWT keys, signing with {signing.kid}")
+
+    def _select_signer(self, keys: dict[str, JWTKey]) -> JWTKey | None:
+        signers = [key for key in keys.values() if key.private_key is not None]
+        if self.signing_kid:
+            signing = next((key for key in signers if key.kid == self.signing_kid), None)
+            if signing is None:
+                logger.error(f"JWT signing key {self.signing_kid} not found")
+            return signing
+        published = time.time() - self.publish_before_use
+        # The newest key every verifier has had time to fetch, the newest key when none has.
+        ready = [key for key in signers if key.created <= published] or signers
+        return max(ready, key=lambda key: key.created, default=None)
+
+    def maybe_reload(self):
+        now = time.monotonic()
+        if not self.directory or now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        try:
+            if os.stat(self.directory).st_mtime_ns != self._directory_mtime:
+                self.load()
+            else:
+                self.signing = self._select_signer(self.keys) or self.signing
+        except OSError as e:
+            logger.error(f"Reloading JWT keys failed: {e}")
+
+    def signing_key(self) -> JWTKey | None:
+        """
+        The current signing key, None only when the ring is disabled.
+        """
+        self.maybe_reload()
+        return self.signing
+
+    def verification_key(self, kid: str) -> JWTKey | None:
+        self.maybe_reload()
+        return self.keys.get(kid)
+
+    def document(self) -> tuple[bytes, str]:
+        """
+        The serialized JWKS document and its ETag.
+        """
+        self.maybe_reload()
+        return self.jwks, self.jwks_etag
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self.keys),
+            "signing_keys": sum(1 for key in self.keys.values() if key.private_key is not None),
+            "reloads": self.reloads,
+        }
+
+keyring = KeyRing(
+    config.jwt_key_dir,
+    signing_kid=config.jwt_signing_kid,
+    publish_before_use=config.jwks_max_age,
+    reload_interval=config.jwt_key_reload_interval,
+)
+
+registry.register(GaugeCollector("astroeyes_jwt_keys", "JWT key ring state.", keyring.stats))
@@ -1,4 +1,8 @@
 import jwt
+import time
+import hashlib
+import secrets
+from collections import OrderedDict
 from datetime import datetime,timezone, timedelta
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -6,18 +10,112 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from utils.config import config
 from utils.db import get_session
+from utils.db.presence import presence
+from utils.db.replicas import current_user
 from utils.db.schemas import UserRefreshToken
+from utils.jwks import keyring
+from utils.metrics import registry, jwt_cpu, GaugeCollector
 
 
 SECRET_KEY = config.secret_key
 ALGORITHM = "HS256"
+if not SECRET_KEY and not keyring.enabled:
+    raise RuntimeError("SECRET_KEY must be set unless tokens are signed with keys from JWT_KEY_DIR")
+# HS256 tokens are only verified against a real secret, never an empty one.
+ACCEPT_HS256 = bool(SECRET_KEY) and (not keyring.enabled or config.jwt_accept_hs256)
+ACCESS_TOKEN_EXPIRE = timedelta(minutes=config.access_token_expire_minutes)
 
 security = HTTPBearer()
 
+class TokenDenylist:
+    """
+    In-process set of revoked refresh token UUIDs.
+    Access tokens carry the UUID of the refresh token that issued them, so denying that UUID
+    rejects every access token of the session without a database lookup. Entries only need to
+    outlive the longest access token, after which they are dropped.
+    Note that the set is per worker process, other workers keep accepting the access tokens
+    until they expire.
+    """
+    def __init__(self, ttl: timedelta):
+        self.ttl = ttl.total_seconds()
+        self._entries: dict[str, float] = {}
+
+    def add(self, token_uuid: str):
+        self._purge()
+        self._entries[token_uuid] = time.monotonic() + self.ttl
+
+    def __contains__(self, token_uuid: str) -> bool:
+        expires_at = self._entries.get(token_uuid)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del self._entries[token_uuid]
+            return False
+        return True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _purge(self):
+        now = time.monotonic()
+        for token_uuid in [k for k, v in self._entries.items() if v <= now]:
+            del self._entries[token_uuid]
+
+revoked_tokens = TokenDenylist(ACCESS_TOKEN_EXPIRE)
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of verified token claims, keyed by a SHA-256 digest of the token.
+    An entry lives until the token's `exp`, so a hit is exactly as valid as a fresh decode
+    while skipping the HMAC check and JSON parsing.
+    """
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> dict | None:
+        key = self.key(token)
+        entry = self._entries.get(key)
+        if entry is not None:
+            payload, expires_at = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return payload
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, token: str, payload: dict):
+        if self.maxsize <= 0 or "exp" not in payload:
+            return
+        self._entries[self.key(token)] = (payload, float(payload["exp"]))
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+verified_tokens = VerifiedTokenCache(config.jwt_cache_size)
+registry.register(GaugeCollector("astroeyes_jwt_cache", "Verified token cache state.", verified_tokens.stats))
+
 def create_refresh_token_payload(uuid: str, device_id: str) -> dict:
     payload = {
         "user_uuid": uuid,
         "device_id": device_id,
+        # iat/exp have one second resolution, the jti keeps tokens issued within the same second distinct.
+        "jti": secrets.token_urlsafe(8),
         "iat": datetime.now(timezone.utc),
         "exp": datetime.now(timezone.utc) + timedelta(days=14)
     }
@@ -28,17 +126,41 @@ def create_access_token_payload(uuid: str, refresh_token_uuid:str, device_id: st
         "user_uuid": uuid,
         "device_id": device_id,
         "refresh_token_uuid": refresh_token_uuid,
+        "type": "access",
         "iat": datetime.now(timezone.utc),
-        "exp": datetime.now(timezone.utc) + timedelta(days=1)
+        "exp": datetime.now(timezone.utc) + ACCESS_TOKEN_EXPIRE
     }
     return payload
 
 def create_jwt_token(payload:dict) -> str:
-    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+    """
+    Signs with the key ring's signing key and its `kid` when asymmetric keys are configured, with SECRET_KEY otherwise.
+    """
+    start = time.thread_time()
+    if not keyring.enabled:
+        token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+    else:
+        key = keyring.signing_key()
+        token = jwt.encode(payload, key.private_key, algorithm=key.algorithm, headers={"kid": key.kid})
+    jwt_cpu.inc("encode", amount=time.thread_time() - start)
+    return token
+
+def _verification_key(token: str) -> tuple:
+    # The header only names the key, the algorithm comes from the key itself.
+    kid = jwt.get_unverified_header(token).get("kid")
+    if kid is None:
+        if not ACCEPT_HS256:
+            raise jwt.InvalidTokenError("HS256 tokens are not accepted")
+        return SECRET_KEY, [ALGORITHM]
+    key = keyring.verification_key(kid)
+    if key is None:
+        raise jwt.InvalidTokenError(f"Unknown key {kid}")
+    return key.public_key, [key.algorithm]
 
 def decode_jwt_token(token: str) -> dict:
+    start = time.thread_time()
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, *_verification_key(token))
         return payload
     except jwt.ExpiredSignatureError:
         raise ValueError("Token has expired")
@@ -46,18 +168,20 @@ def decode_jwt_token(token: str) -> dict:
         raise ValueError("Invalid token")
     except Exception as e:
         raise ValueError(f"An error occurred while decoding the token: {str(e)}")
+    finally:
+        jwt_cpu.inc("decode", amount=time.thread_time() - start)
+
+def decode_jwt_token_cached(token: str) -> dict:
+    """
+    Same as `decode_jwt_token`, but serves repeat tokens from `verified_tokens`.
+    The returned claims are shared with the cache and must not be modified.
+    """
+    payload = verified_tokens.get(token)
+    if payload is None:
+        payload = decode_jwt_token(token)
+        verified_tokens.put(token, payload)
+    return payload
 
-def verify_jwt_token(token: str) -> bool:
-    try:
-        jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return True
-    except jwt.ExpiredSignatureError:
-        return False
-    except jwt.InvalidTokenError:
-        return False
-    except Exception as e:
-        raise ValueError(f"An error occurred while verifying the token: {str(e)}")
-    
 async def verify_jwt_token_db(token: str, db: AsyncSession) -> bool:
     try:
         user_uuid = decode_jwt_token(token)["user_uuid"]
@@ -70,30 +194,50 @@ async def verify_jwt_token_db(token: str, db: AsyncSession) -> bool:
         )
         token = result.scalar_one_or_none()
         
+        # Expired rows are left for the background sweeper in utils.db.sweeper.
         if (
             token 
             and token.user_uuid == user_uuid 
             and token.expires_at > datetime.now(timezone.utc)
         ):
             return True
-        
-        if token and token.expires_at <= datetime.now(timezone.utc):
-            try:
-                await db.delete(token)
-                await db.commit()
-            except Exception:
-                pass
-            return False
     except Exception:
         pass
 
     return False
 
+def create_access_token(uuid: str, refresh_token_uuid: str, device_id: str) -> tuple[str, datetime]:
+    payload = create_access_token_payload(uuid, refresh_token_uuid, device_id)
+    return create_jwt_token(payload), payload["exp"]
+
+def verify_access_token(token: str) -> dict | None:
+    """
+    Checks an access token without touching the database.
+    Only access tokens are accepted, and tokens whose refresh token has been revoked on this
+    worker are rejected through `revoked_tokens`.
+    Returns:
+        The token payload, or None if the token is not a valid access token.
+    """
+    try:
+        payload = decode_jwt_token_cached(token)
+    except ValueError:
+        return None
+
+    if payload.get("type") != "access" or payload.get("refresh_token_uuid") in revoked_tokens:
+        return None
+    return payload
+
 async def get_user_uuid(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
-    if verify_jwt_token(credentials.credentials):
-        return decode_jwt_token(credentials.credentials)["user_uuid"]
-    else:
+    """
+    Resolves the user UUID from an access token through `verify_access_token`.
+    The user is marked active in `presence` and recorded in `current_user` for replica routing.
+    """
+    payload = verify_access_token(credentials.credentials)
+    if payload is None:
         raise HTTPException(
             status_code=401,
             detail=f"Invalid or expired token."
-        )
\ No newline at end of file
+        )
+    presence.touch(payload["user_uuid"])
+    current_user.set(payload["user_uuid"])
+    return payload["user_uuid"]
\ No newline at end of file
@@ -1,6 +1,102 @@
+import atexit
+import copy
+import json
 import logging
+import queue
+import sys
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from utils.config import config
+from utils.metrics import registry, current_scope, route_label, Counter, GaugeCollector
+
+# Request id of the request being handled, set by AccessLogMiddleware.
+request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+log_records_dropped = registry.register(Counter(
+    "astroeyes_log_records_dropped_total", "Log records dropped because the log queue was full.", ("level",)))
+
+# Extra attributes copied from records into the JSON output when present.
+STRUCTURED_FIELDS = ("request_id", "route", "method", "path", "status", "latency_ms", "client")
+
+class ContextFilter(logging.Filter):
+    """
+    Stamps records with the current request id and route. Runs on the logging thread, before the record is queued.
+    """
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id.get()
+        if not hasattr(record, "route"):
+            scope = current_scope.get()
+            record.route = route_label(scope) if scope is not None else None
+        return True
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler over a bounded queue that drops and counts records instead of blocking when the writer falls behind.
+    """
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped.inc(record.levelname)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only merge the arguments here, the writer thread does the actual formatting.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class JsonFormatter(logging.Formatter):
+    converter = time.gmtime
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+def _writer() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stderr)
+    if config.log_format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+    return handler
+
+log_queue: queue.Queue = queue.Queue(maxsize=config.log_queue_size)
+
+queue_handler = DroppingQueueHandler(log_queue)
+queue_handler.addFilter(ContextFilter())
+
+# A single writer thread does the formatting and the blocking writes, request handlers only enqueue.
+listener = QueueListener(log_queue, _writer(), respect_handler_level=True)
 
 logger = logging.getLogger()
 
-logger.setLevel(logging.INFO)
+logger.setLevel(config.log_level)
+logger.addHandler(queue_handler)
+# SQLAlchemy logs pool events at INFO once the root logger has a handler, under the pool class' module.
+logging.getLogger("sqlalchemy").setLevel(logging.WARNING)
+logging.getLogger("utils.db.pool").setLevel(logging.WARNING)
+
+listener.start()
+atexit.register(listener.stop)
 
+registry.register(GaugeCollector(
+    "astroeyes_log_queue", "Log queue state.",
+    lambda: {"depth": log_queue.qsize(), "capacity": log_queue.maxsize},
+))
@@ -0,0 +1,135 @@
+import bisect
+import time
+from contextvars import ContextVar
+from typing import Callable
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# ASGI scope of the request being handled, the router fills in scope["route"] once it matched.
+current_scope: ContextVar[dict | None] = ContextVar("current_scope", default=None)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: tuple[str, str] | None = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0):
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self.values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self.values: dict[tuple, list[float]] = {}
+
+    def observe(self, value: float, *labels):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                bucket_labels = _format_labels(self.labelnames, labels, ("le", bound))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+class GaugeCollector:
+    """
+    Gauges read from a callback at scrape time, e.g. pool or cache statistics.
+    The callback returns a dict of {suffix: value}, each exported as `<prefix>_<suffix>`.
+    """
+    def __init__(self, prefix: str, help: str, collect: Callable[[], dict]):
+        self.prefix = prefix
+        self.help = help
+        self.collect = collect
+
+    def render(self) -> list[str]:
+        lines = []
+        for key, value in self.collect().items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"{self.prefix}_{key}"
+            lines += [f"# HELP {name} {self.help}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics: list = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "astroeyes_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")))
+http_latency = registry.register(Histogram(
+    "astroeyes_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route")))
+db_statement_latency = registry.register(Histogram(
+    "astroeyes_db_statement_duration_seconds", "Database statement latency by the route that issued it.", ("route",)))
+password_cpu = registry.register(Counter(
+    "astroeyes_password_hashing_cpu_seconds_total", "CPU time spent in password hashing workers.", ("operation",)))
+jwt_cpu = registry.register(Counter(
+    "astroeyes_jwt_cpu_seconds_total", "CPU time spent encoding and decoding JWTs.", ("operation",)))
+
+def route_label(scope: dict | None) -> str:
+    if scope is None:
+        return "background"
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+def instrument_engine(engine: Engine):
+    """
+    Times every statement on `engine` (the sync engine behind an AsyncEngine) and tags it with the current route.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        db_statement_latency.observe(time.perf_counter() - start, route_label(current_scope.get()))
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
@@ -0,0 +1,193 @@
+import asyncio
+import json
+from typing import Callable
+from utils.config import config
+from utils.log import logger
+from utils.metrics import registry, GaugeCollector
+
+def user_topic(user_uuid: str) -> str:
+    """
+    Topic of a user's public changes: presence and profile updates.
+    """
+    return f"user:{user_uuid}"
+
+class Subscription:
+    """
+    A subscriber's bounded queue of serialized events. When it is full the subscriber is too slow:
+    it is evicted, its backlog is dropped and a `None` sentinel tells the reader to disconnect.
+    """
+    def __init__(self, broker: "InProcessBroker", maxsize: int):
+        self.broker = broker
+        self.queue: asyncio.Queue[str | None] = asyncio.Queue(maxsize)
+        self.topics: set[str] = set()
+        self.evicted = False
+
+    def offer(self, data: str):
+        if self.evicted:
+            return
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            self.evicted = True
+            self.broker.evicted += 1
+            self.close()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def get(self) -> str | None:
+        return await self.queue.get()
+
+    def subscribe(self, *topics: str):
+        for topic in topics:
+            self.broker.topics.setdefault(topic, set()).add(self)
+            self.topics.add(topic)
+
+    def unsubscribe(self, *topics: str):
+        for topic in topics:
+            subscribers = self.broker.topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(self)
+                if not subscribers:
+                    del self.broker.topics[topic]
+            self.topics.discard(topic)
+
+    def close(self):
+        self.unsubscribe(*list(self.topics))
+        self.broker.subscriptions.discard(self)
+
+class InProcessBroker:
+    """
+    Topic fan-out to the subscribers of this worker. `publish` never awaits: the event is serialized
+    once and offered to each subscriber's queue, so a publisher is never slowed down by its readers.
+    """
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.topics: dict[str, set[Subscription]] = {}
+        self.subscriptions: set[Subscription] = set()
+        self.published = 0
+        self.delivered = 0
+        self.evicted = 0
+
+    def subscription(self) -> Subscription:
+        subscription = Subscription(self, self.queue_size)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def publish(self, topic: str, event: dict):
+        self.published += 1
+        self.deliver(topic, json.dumps({"topic": topic, **event}, default=str))
+
+    def deliver(self, topic: str, data: str):
+        subscribers = self.topics.get(topic)
+        if not subscribers:
+            return
+        self.delivered += len(subscribers)
+        for subscription in list(subscribers):
+            subscription.offer(data)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def stats(self) -> dict:
+        return {
+            "subscriptions": len(self.subscriptions),
+            "topics": len(self.topics),
+            "published": self.published,
+            "delivered": self.delivered,
+            "evicted": self.evicted,
+        }
+
+class RedisBroker(InProcessBroker):
+    """
+    Cross-worker broker: events are published to one Redis channel and every worker delivers them to
+    its own subscribers. Publishing stays non-blocking through a bounded outbox, events that do not
+    fit are dropped and counted.
+    """
+    def __init__(self, url: str, queue_size: int, channel: str = "astroeyes:events", outbox_size: int = 10000):
+        super().__init__(queue_size)
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("The redis package is required for a shared pub/sub backend") from e
+        self.client = redis.from_url(url)
+        self.channel = channel
+        self.outbox: asyncio.Queue[str] | None = None
+        self.outbox_size = outbox_size
+        self.dropped = 0
+        self._tasks: list[asyncio.Task] = []
+
+    def publish(self, topic: str, event: dict):
+        self.published += 1
+        if self.outbox is None:
+            return
+        try:
+            self.outbox.put_nowait(json.dumps({"topic": topic, **event}, default=str))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _send(self):
+        while True:
+            data = await self.outbox.get()
+            try:
+                await self.client.publish(self.channel, data)
+            except Exception as e:
+                self.dropped += 1
+                logger.warning(f"Pub/sub publish failed: {e}")
+
+    async def _listen(self):
+        while True:
+            try:
+                async with self.client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        data = message["data"].decode()
+                        self.deliver(json.loads(data)["topic"], data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Pub/sub listener failed, reconnecting: {e}")
+                await asyncio.sleep(1)
+
+    async def start(self):
+        self.outbox = asyncio.Queue(self.outbox_size)
+        self._tasks = [asyncio.create_task(self._send()), asyncio.create_task(self._listen())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.outbox = None
+        await self.client.aclose()
+
+    def stats(self) -> dict:
+        return {**super().stats(), "dropped": self.dropped}
+
+broker = (
+    RedisBroker(config.pubsub_url, config.ws_send_queue_size)
+    if config.pubsub_url else InProcessBroker(config.ws_send_queue_size)
+)
+
+async def consume(topic: str, handler: Callable[[dict], None], on_gap: Callable[[], None]):
+    """
+    Calls `handler` with every event published on `topic`, for listeners keeping per-worker state in sync.
+    A subscription evicted for falling behind is replaced, after calling `on_gap` since events were lost.
+    """
+    while True:
+        subscription = broker.subscription()
+        subscription.subscribe(topic)
+        try:
+            while (data := await subscription.get()) is not None:
+                handler(json.loads(data))
+        finally:
+            subscription.close()
+        logger.warning(f"Listener on {topic} fell behind and lost events")
+        on_gap()
+
+registry.register(GaugeCollector("astroeyes_pubsub", "Pub/sub broker state.", broker.stats))